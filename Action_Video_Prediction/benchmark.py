@@ -0,0 +1,363 @@
+"""
+Action Prediction Benchmark
+Generates synthetic rally-like videos and times each stage of predict_video
+(metadata, frame selection, decoding, model load, pose, tracking, LSTM) and
+of the live pipeline (frame decode, pose, LSTM), reporting latency
+percentiles, throughput and peak RSS. Runs offline on CPU once the YOLO pose
+weights are present locally.
+
+YOLO does not detect the synthetic stick figures as people, so on generated
+videos the pose, tracking and LSTM stages only cover the no-detection path.
+Pass --video with a real rally clip to time multi-person detection and
+tracking.
+
+Usage:
+    python benchmark.py
+    python benchmark.py --frames 300 --width 1920 --height 1080 --runs 10
+    python benchmark.py --video rally.mp4
+    python benchmark.py --output bench.json
+    python benchmark.py --baseline bench.json --max_regression 0.2
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import numpy as np
+import cv2
+
+# Peak RSS: resource is Unix-only; psutil (optional) covers Windows
+try:
+    import resource
+except ImportError:
+    resource = None
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+import model_registry
+from predict_action import (
+    SAMPLING_STRATEGIES,
+    AdaptiveKeyframeExtractor,
+    KeypointExtractor,
+    VideoFrameSource,
+    active_player_features,
+    classify_features,
+    detect_people,
+    load_classifier,
+    predict_video,
+    read_video_metadata,
+    track_people,
+)
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_synthetic_video(path, frames=120, width=1280, height=720, fps=30.0, players=2, seed=0):
+    """
+    Write an mp4 of stick figures swinging across a court-coloured
+    background, so decoding and pose estimation see realistic frame sizes
+    and some motion (YOLO finds no people in them, see --video)
+    """
+    rng = np.random.default_rng(seed)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"Cannot write video: {path}")
+
+    scale = height / 720
+    starts = rng.uniform(0.2, 0.8, size=(players, 2)) * (width, height)
+    try:
+        for i in range(frames):
+            frame = np.full((height, width, 3), (60, 120, 40), dtype=np.uint8)
+            cv2.line(frame, (0, height // 2), (width, height // 2), (255, 255, 255), max(1, int(4 * scale)))
+            for p, (x, y) in enumerate(starts):
+                x = int(x + 80 * scale * np.sin(i / 15 + p))
+                y = int(y)
+                angle = np.sin(i / 5 + p) * 1.2
+                body = int(90 * scale)
+                cv2.circle(frame, (x, y - body), int(18 * scale), (200, 180, 160), -1)
+                cv2.line(frame, (x, y - body), (x, y), (30, 30, 200), int(10 * scale))
+                hand = (int(x + body * np.cos(angle)), int(y - body + body * np.sin(angle)))
+                cv2.line(frame, (x, y - int(body * 0.8)), hand, (200, 180, 160), int(6 * scale))
+                cv2.line(frame, (x, y), (x - int(30 * scale), y + body), (40, 40, 40), int(8 * scale))
+                cv2.line(frame, (x, y), (x + int(30 * scale), y + body), (40, 40, 40), int(8 * scale))
+            writer.write(frame)
+    finally:
+        writer.release()
+    return path
+
+
+def video_info(path):
+    """Frame count, resolution and frame rate of an existing video"""
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise RuntimeError(f"Cannot open video: {path}")
+    info = {
+        "video": path,
+        "frames": int(capture.get(cv2.CAP_PROP_FRAME_COUNT)),
+        "resolution": f"{int(capture.get(cv2.CAP_PROP_FRAME_WIDTH))}x"
+                      f"{int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))}",
+        "fps": capture.get(cv2.CAP_PROP_FPS)
+    }
+    capture.release()
+    return info
+
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process so far, or None when it can't be
+    measured (ru_maxrss is KB on Linux, bytes on macOS)
+    """
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+    if psutil is not None:
+        # Windows: peak working set
+        peak = getattr(psutil.Process().memory_info(), 'peak_wset', None)
+        if peak is not None:
+            return round(peak / (1024 * 1024), 1)
+    return None
+
+
+def summarize(samples):
+    """Latency percentiles in milliseconds"""
+    ms = np.array(samples) * 1000
+    return {
+        "count": len(ms),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p90_ms": round(float(np.percentile(ms, 90)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "max_ms": round(float(ms.max()), 3)
+    }
+
+
+class StageTimer:
+    """Collects durations per stage name"""
+    def __init__(self):
+        self.samples = {}
+
+    def time(self, stage, fn, *args, **kwargs):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        self.samples.setdefault(stage, []).append(time.perf_counter() - start)
+        return result
+
+    def report(self):
+        return {stage: summarize(samples) for stage, samples in self.samples.items()}
+
+
+def bench_predict_video(video_path, model_path, runs=5, device='cpu', sampling='uniform',
+                        runtime='eager'):
+    """
+    Time predict_video stage by stage (same calls, in order), with a cold
+    model load per run, then end to end with warm models
+    """
+    timer = StageTimer()
+    for _ in range(runs):
+        model_registry.clear()
+        keyframe_extractor = AdaptiveKeyframeExtractor(target_frames=16, strategy=sampling)
+        timer.time("metadata", read_video_metadata, video_path)
+        frame_indices = timer.time("frame_selection", keyframe_extractor.extract_frame_indices,
+                                   video_path)
+        frame_source = VideoFrameSource(video_path)
+        frames = timer.time("decode", lambda: [frame for _, frame in
+                                                frame_source.read_frames(frame_indices)])
+
+        def load_models():
+            return (KeypointExtractor(device=device, runtime=runtime),
+                    load_classifier(model_path, device=device, runtime=runtime))
+        keypoint_extractor, model = timer.time("model_load", load_models)
+
+        detections, frame_shapes = timer.time("pose", detect_people, frames, keypoint_extractor)
+        tracks = timer.time("tracking", track_people, detections, frame_shapes)
+        features = active_player_features(tracks, len(frame_shapes))
+        timer.time("lstm", classify_features, features, model, device=device)
+
+    end_to_end = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = predict_video(video_path, model_path, device=device, sampling=sampling,
+                               runtime=runtime)
+        end_to_end.append(time.perf_counter() - start)
+        if not result.get("success"):
+            raise RuntimeError(result.get("error"))
+
+    return {
+        "stages": timer.report(),
+        "end_to_end_warm": summarize(end_to_end),
+        "videos_per_s": round(len(end_to_end) / sum(end_to_end), 3),
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+
+def bench_live(video_path, model_path, frames=120, device='cpu', runtime='eager',
+               incremental=False, jpeg_quality=80):
+    """
+    Feed the synthetic video to LiveActionPredictor as JPEG frames, the way
+    the webcam page sends them, and time each stage per frame
+    """
+    sys.path.append(os.path.join(REPO_DIR, "Live_Action"))
+    from live_predict import LiveActionPredictor, decode_frame
+
+    capture = cv2.VideoCapture(video_path)
+    encoded = []
+    while len(encoded) < frames:
+        ret, frame = capture.read()
+        if not ret:
+            break
+        ok, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
+        if ok:
+            encoded.append(jpeg.tobytes())
+    capture.release()
+    if not encoded:
+        raise RuntimeError(f"No frames decoded from {video_path}")
+
+    predictor = LiveActionPredictor(model_path, device=device, runtime=runtime,
+                                    incremental=incremental)
+    timer = StageTimer()
+    per_frame = []
+    for data in encoded:
+        start = time.perf_counter()
+        frame = timer.time("frame_decode", decode_frame, data)
+        timer.time("pose", predictor.add_frame, frame)
+        timer.time("lstm", predictor.predict)
+        per_frame.append(time.perf_counter() - start)
+
+    return {
+        "incremental": incremental,
+        "stages": timer.report(),
+        "per_frame": summarize(per_frame),
+        "frames_per_s": round(len(per_frame) / sum(per_frame), 2),
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+
+def compare(results, baseline, max_regression):
+    """
+    List stages whose p50 got slower than the baseline by more than
+    max_regression (a fraction)
+    """
+    regressions = []
+
+    def walk(current, previous, path):
+        if not isinstance(current, dict) or not isinstance(previous, dict):
+            return
+        if "p50_ms" in current and "p50_ms" in previous:
+            if previous["p50_ms"] > 0 and \
+                    current["p50_ms"] > previous["p50_ms"] * (1 + max_regression):
+                regressions.append({
+                    "stage": path,
+                    "baseline_p50_ms": previous["p50_ms"],
+                    "p50_ms": current["p50_ms"]
+                })
+            return
+        for key, value in current.items():
+            walk(value, previous.get(key), f"{path}.{key}" if path else key)
+
+    walk(results, baseline, "")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the action prediction pipeline")
+    parser.add_argument("--model", help="Path to model file")
+    parser.add_argument("--live_model", help="Path to the live model file")
+    parser.add_argument("--device", default="cpu", choices=["cpu", "cuda"], help="Device to use")
+    parser.add_argument("--runtime", default="eager", choices=model_registry.RUNTIMES,
+                        help="Model runtime (see export_models.py)")
+    parser.add_argument("--sampling", default="uniform", choices=SAMPLING_STRATEGIES,
+                        help="Keyframe sampling strategy")
+    parser.add_argument("--video",
+                        help="Benchmark this clip instead of a synthetic video (which has no "
+                             "detectable people, so pose/tracking/LSTM only run the empty path)")
+    parser.add_argument("--frames", type=int, default=120,
+                        help="Frames per synthetic video; also the live benchmark length")
+    parser.add_argument("--width", type=int, default=1280, help="Synthetic video width")
+    parser.add_argument("--height", type=int, default=720, help="Synthetic video height")
+    parser.add_argument("--fps", type=float, default=30.0, help="Synthetic video frame rate")
+    parser.add_argument("--runs", type=int, default=5, help="Repetitions of predict_video")
+    parser.add_argument("--skip_video", action="store_true", help="Skip the predict_video benchmark")
+    parser.add_argument("--skip_live", action="store_true", help="Skip the live benchmark")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Benchmark the live predictor in incremental LSTM mode")
+    parser.add_argument("--output", help="Also write the report to this JSON file")
+    parser.add_argument("--baseline", help="Earlier report to compare stage p50 latencies against")
+    parser.add_argument("--max_regression", type=float, default=0.2,
+                        help="Allowed p50 slowdown vs the baseline (0.2 = 20%%)")
+
+    args = parser.parse_args()
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    model_path = os.path.abspath(args.model) if args.model else \
+        os.path.join(script_dir, "Model_2dongtac.pth")
+    live_model_path = os.path.abspath(args.live_model) if args.live_model else \
+        os.path.join(REPO_DIR, "Live_Action", "Model_2dongtac.pth")
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            if args.video:
+                video_path = os.path.abspath(args.video)
+                config = video_info(video_path)
+            else:
+                video_path = make_synthetic_video(
+                    os.path.join(tmp_dir, "synthetic.mp4"),
+                    frames=args.frames, width=args.width, height=args.height, fps=args.fps
+                )
+                config = {
+                    "video": "synthetic",
+                    "frames": args.frames,
+                    "resolution": f"{args.width}x{args.height}",
+                    "fps": args.fps
+                }
+            result = {
+                "success": True,
+                "config": {
+                    **config,
+                    "runs": args.runs,
+                    "device": args.device,
+                    "runtime": args.runtime,
+                    "sampling": args.sampling
+                }
+            }
+            if not args.skip_video:
+                result["predict_video"] = bench_predict_video(
+                    video_path, model_path, runs=args.runs, device=args.device,
+                    sampling=args.sampling, runtime=args.runtime
+                )
+            if not args.skip_live:
+                result["live"] = bench_live(
+                    video_path, live_model_path, frames=args.frames, device=args.device,
+                    runtime=args.runtime, incremental=args.incremental
+                )
+        result["peak_rss_mb"] = peak_rss_mb()
+
+        if args.baseline:
+            with open(args.baseline, 'r', encoding='utf-8') as f:
+                baseline = json.load(f)
+            regressions = compare(result, baseline, args.max_regression)
+            result["regressions"] = regressions
+            if regressions:
+                result["success"] = False
+                result["error"] = f"{len(regressions)} stage(s) slower than the baseline"
+    except Exception as e:
+        import traceback
+        result = {
+            "success": False,
+            "error": str(e),
+            "traceback": traceback.format_exc()
+        }
+
+    if args.output and "config" in result:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+    print(json.dumps(result, indent=2))
+    if not result.get("success"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""
+Model Export Script
+Exports the LSTM classifier and the YOLO pose model for the CPU runtimes in
+model_registry (TorchScript, ONNX; int8 quantization happens at load time)
+and checks that every runtime still agrees with the eager checkpoint.
+
+Usage:
+    python export_models.py
+    python export_models.py --videos clip1.mp4 clip2.mp4 --runtimes quantized onnx
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+import torch
+
+import model_registry
+from predict_action import (
+    AdaptiveKeyframeExtractor,
+    KeypointExtractor,
+    KeypointLSTMClassifier,
+    extract_features,
+    read_keyframes,
+)
+
+MODEL_KWARGS = dict(feature_dim=51, hidden=128, num_layers=1, num_classes=2, dropout=0.3)
+
+
+def export_classifier(model_path, runtime, seq_length=16):
+    """
+    Write the TorchScript or ONNX copy of the classifier next to model_path
+
+    Returns:
+        Path of the exported file
+    """
+    model = model_registry.load_eager_classifier(model_path, KeypointLSTMClassifier,
+                                                 **MODEL_KWARGS)
+    example = torch.zeros(1, seq_length, MODEL_KWARGS["feature_dim"])
+    output_path = model_registry.export_path(model_path, runtime)
+
+    if runtime == 'torchscript':
+        torch.jit.trace(model, example).save(output_path)
+    elif runtime == 'onnx':
+        torch.onnx.export(
+            model,
+            (example,),
+            output_path,
+            input_names=['keypoints'],
+            output_names=['logits'],
+            dynamic_axes={'keypoints': {0: 'batch'}, 'logits': {0: 'batch'}},
+            dynamo=False
+        )
+    else:
+        raise ValueError(f"Runtime '{runtime}' has no exported classifier")
+    return output_path
+
+
+def export_pose(weights, runtime):
+    """
+    Export the YOLO pose model with ultralytics (dynamic batch for ONNX)
+
+    Returns:
+        Path of the exported file
+    """
+    from ultralytics import YOLO
+
+    # Exports are written next to the weights, where model_registry looks
+    model = YOLO(model_registry.resolve_pose_weights(weights))
+    if runtime == 'onnx':
+        return model.export(format='onnx', imgsz=640, dynamic=True)
+    if runtime == 'torchscript':
+        return model.export(format='torchscript', imgsz=640)
+    raise ValueError(f"Runtime '{runtime}' has no exported pose model")
+
+
+def synthetic_sequences(samples, seq_length=16, seed=0):
+    """
+    Random keypoint sequences in the extractor's format: normalized x, y
+    drifting over time, confidences in [0, 1], some frames with no person
+    """
+    rng = np.random.default_rng(seed)
+    start = rng.uniform(0.2, 0.8, size=(samples, 1, 17, 2))
+    drift = rng.normal(0, 0.02, size=(samples, seq_length, 17, 2)).cumsum(axis=1)
+    xy = np.clip(start + drift, 0, 1)
+    conf = rng.uniform(0, 1, size=(samples, seq_length, 17, 1))
+    sequences = np.concatenate([xy, conf], axis=-1).reshape(samples, seq_length, 51)
+    missing = rng.uniform(size=(samples, seq_length)) < 0.05
+    sequences[missing] = 0
+    return sequences.astype(np.float32)
+
+
+def video_samples(video_paths, pose_weights, device='cpu'):
+    """
+    Keyframes and keypoint sequences of real videos (first 16 frames, as in
+    training)
+
+    Returns:
+        (list of frame lists, np.array (N, 16, 51))
+    """
+    keyframe_extractor = AdaptiveKeyframeExtractor(target_frames=16, strategy='head')
+    keypoint_extractor = KeypointExtractor(device=device, weights=pose_weights)
+    frames_per_video, sequences = [], []
+    for video_path in video_paths:
+        frames = [f for f in read_keyframes(video_path, keyframe_extractor) if f is not None]
+        if not frames:
+            print(f"Skipping {video_path}: no frames decoded", file=sys.stderr)
+            continue
+        frames_per_video.append(frames)
+        sequences.append(extract_features(frames, keypoint_extractor))
+    return frames_per_video, np.stack(sequences) if sequences else None
+
+
+def _probabilities(model, features):
+    with torch.no_grad():
+        return torch.softmax(model(torch.from_numpy(features)), dim=1).numpy()
+
+
+def _latency_ms(model, features, repeats=50):
+    # Single-sequence calls, as in live prediction
+    sample = torch.from_numpy(features[:1])
+    with torch.no_grad():
+        model(sample)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            model(sample)
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def check_classifier_parity(model_path, runtimes, features, atol=1e-3, min_agreement=99.0):
+    """
+    Compare each runtime against the eager checkpoint on the same inputs
+
+    Float runtimes must match probabilities within atol; quantized must
+    agree on the predicted class for at least min_agreement percent.
+    """
+    reference = model_registry.load_eager_classifier(model_path, KeypointLSTMClassifier,
+                                                     **MODEL_KWARGS)
+    reference_probs = _probabilities(reference, features)
+    reference_pred = reference_probs.argmax(axis=1)
+
+    report = {
+        "eager": {
+            "mean_latency_ms": round(_latency_ms(reference, features), 4),
+            "memory_bytes": model_registry.model_bytes(reference)
+        }
+    }
+    for runtime in runtimes:
+        model = model_registry.get_classifier(model_path, KeypointLSTMClassifier,
+                                              runtime=runtime, **MODEL_KWARGS)
+        probs = _probabilities(model, features)
+        max_diff = float(np.abs(probs - reference_probs).max())
+        agreement = float((probs.argmax(axis=1) == reference_pred).mean() * 100)
+        if runtime == 'quantized':
+            passed = agreement >= min_agreement
+        else:
+            passed = max_diff <= atol
+        report[runtime] = {
+            "max_abs_prob_diff": round(max_diff, 6),
+            "prediction_agreement": round(agreement, 2),
+            "mean_latency_ms": round(_latency_ms(model, features), 4),
+            "memory_bytes": model_registry.model_bytes(model),
+            "passed": passed
+        }
+    return report
+
+
+def check_pose_parity(pose_weights, runtimes, frames_per_video, atol=0.01):
+    """
+    Compare the keypoints of the most confident person per frame between
+    the eager and exported pose models (normalized coordinates)
+    """
+    frames = [frame for frames in frames_per_video for frame in frames]
+    reference = KeypointExtractor(weights=pose_weights).extract_batch(frames)
+    report = {}
+    for runtime in runtimes:
+        if runtime not in model_registry.EXPORT_SUFFIXES:
+            continue
+        extractor = KeypointExtractor(weights=pose_weights, runtime=runtime)
+        features = extractor.extract_batch(frames)
+        xy_diff = np.abs(features - reference).reshape(len(frames), 17, 3)[:, :, :2]
+        max_diff = float(xy_diff.max()) if len(frames) else 0.0
+        report[runtime] = {
+            "frames": len(frames),
+            "max_abs_keypoint_diff": round(max_diff, 6),
+            "passed": max_diff <= atol
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export models for CPU runtimes and check parity")
+    parser.add_argument("--model", help="Path to model file")
+    parser.add_argument("--pose_weights", default=model_registry.DEFAULT_POSE_WEIGHTS,
+                        help="YOLO pose weights to export")
+    parser.add_argument("--runtimes", nargs="+", default=['quantized', 'torchscript', 'onnx'],
+                        choices=[r for r in model_registry.RUNTIMES if r != 'eager'],
+                        help="Runtimes to export and check")
+    parser.add_argument("--skip_pose", action="store_true", help="Only export the classifier")
+    parser.add_argument("--videos", nargs="*", default=[],
+                        help="Videos for parity inputs (also enables the pose parity check)")
+    parser.add_argument("--samples", type=int, default=512,
+                        help="Synthetic sequences for the classifier parity check")
+    parser.add_argument("--atol", type=float, default=1e-3,
+                        help="Max probability difference for float runtimes")
+    parser.add_argument("--min_agreement", type=float, default=99.0,
+                        help="Min %% of matching predictions for the quantized runtime")
+
+    args = parser.parse_args()
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    model_path = os.path.abspath(args.model) if args.model else \
+        os.path.join(script_dir, "Model_2dongtac.pth")
+
+    if not os.path.exists(model_path):
+        result = {
+            "success": False,
+            "error": f"Model file not found: {model_path}"
+        }
+        print(json.dumps(result, indent=2))
+        sys.exit(1)
+
+    try:
+        exports = {}
+        for runtime in args.runtimes:
+            if runtime not in model_registry.EXPORT_SUFFIXES:
+                continue
+            exports[f"classifier_{runtime}"] = export_classifier(model_path, runtime)
+            if not args.skip_pose:
+                exports[f"pose_{runtime}"] = str(export_pose(args.pose_weights, runtime))
+
+        features = synthetic_sequences(args.samples)
+        frames_per_video = []
+        if args.videos:
+            frames_per_video, video_features = video_samples(args.videos, args.pose_weights)
+            if video_features is not None:
+                features = np.concatenate([features, video_features])
+
+        parity = {
+            "classifier": check_classifier_parity(model_path, args.runtimes, features,
+                                                  atol=args.atol,
+                                                  min_agreement=args.min_agreement)
+        }
+        if frames_per_video and not args.skip_pose:
+            parity["pose"] = check_pose_parity(args.pose_weights, args.runtimes,
+                                               frames_per_video)
+
+        passed = all(entry.get("passed", True)
+                     for section in parity.values() for entry in section.values())
+        result = {
+            "success": passed,
+            "exports": exports,
+            "parity_samples": len(features),
+            "parity": parity
+        }
+        if not passed:
+            result["error"] = "Parity check failed"
+    except Exception as e:
+        import traceback
+        result = {
+            "success": False,
+            "error": str(e),
+            "traceback": traceback.format_exc()
+        }
+
+    print(json.dumps(result, indent=2))
+    if not result.get("success"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Keypoint Feature Cache
+Stores the per-frame pose detections of a video on disk so re-classifying
+the same upload (retries, a new LSTM checkpoint) skips decoding and YOLO.
+
+Entries are keyed by the video's content hash, the pose model version and
+the keyframe sampling settings, and the cache is kept under a size limit by
+evicting the least recently used entries.
+"""
+
+import hashlib
+import os
+import threading
+
+import numpy as np
+
+CACHE_FORMAT = 1  # Bump when the stored arrays change
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    """Hex sha256 of a file's content"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class FeatureCache:
+    """
+    On-disk LRU cache of pose detections (one .npz per video and settings)
+
+    Args:
+        cache_dir: Directory for the cache files (created if missing)
+        max_bytes: Total size above which the oldest entries are evicted
+    """
+    def __init__(self, cache_dir, max_bytes=512 * 1024 * 1024):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self._versions = {}  # (path, size, mtime) -> content hash
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _version(self, path):
+        # Content hash, memoized per file state so unchanged weights or
+        # videos are only hashed once per process
+        stat = os.stat(path)
+        state = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        with self.lock:
+            version = self._versions.get(state)
+        if version is None:
+            version = file_sha256(path)
+            with self.lock:
+                self._versions[state] = version
+        return version
+
+    def key(self, video_path, pose_weights, pose_runtime, sampling):
+        """
+        Cache key for a video's detections
+
+        Args:
+            video_path: Video file (hashed by content, not by name)
+            pose_weights: Pose weights path or name; downloaded weights are
+                identified by content, bare names by name
+            pose_runtime: Pose model runtime (exported models differ slightly)
+            sampling: Keyframe sampling signature (see
+                AdaptiveKeyframeExtractor.signature)
+        """
+        if os.path.exists(pose_weights):
+            pose_version = self._version(pose_weights)[:16]
+        else:
+            pose_version = os.path.basename(pose_weights)
+        parts = [self._version(video_path), pose_version, pose_runtime, sampling,
+                 f"v{CACHE_FORMAT}"]
+        return hashlib.sha256("|".join(parts).encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def get(self, key):
+        """
+        Return (detections, frame_shapes) as produced by detect_people, or
+        None on a miss
+        """
+        path = self._path(key)
+        try:
+            with np.load(path) as data:
+                frame_index = data['frame_index']
+                boxes = data['boxes']
+                scores = data['scores']
+                features = data['features']
+                shapes = data['frame_shapes']
+        except (OSError, KeyError, ValueError):
+            return None
+        # Mark as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        frame_shapes = [None if h < 0 else (int(h), int(w)) for h, w in shapes]
+        detections = [[] for _ in frame_shapes]
+        for i, box, score, feature in zip(frame_index, boxes, scores, features):
+            detections[int(i)].append({
+                "box": box.tolist(),
+                "score": float(score),
+                "features": feature
+            })
+        return detections, frame_shapes
+
+    def put(self, key, detections, frame_shapes):
+        """Store detections and evict old entries if over the size limit"""
+        people = [(i, person) for i, frame_people in enumerate(detections)
+                  for person in frame_people]
+        shapes = np.array([shape if shape is not None else (-1, -1) for shape in frame_shapes],
+                          dtype=np.int32).reshape(-1, 2)
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                frame_index=np.array([i for i, _ in people], dtype=np.int32),
+                boxes=np.array([p["box"] for _, p in people], dtype=np.float32).reshape(-1, 4),
+                scores=np.array([p["score"] for _, p in people], dtype=np.float32),
+                features=np.array([p["features"] for _, p in people],
+                                  dtype=np.float32).reshape(-1, 51),
+                frame_shapes=shapes
+            )
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def evict(self):
+        """Delete least recently used entries until under max_bytes"""
+        with self.lock:
+            entries = []
+            for name in os.listdir(self.cache_dir):
+                if not name.endswith('.npz'):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(self.cache_dir, name))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+            total = sum(size for _, size, _ in entries)
+            for _, size, name in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                    total -= size
+                except OSError:
+                    pass
+
+    def size(self):
+        """Total bytes currently cached"""
+        return sum(os.path.getsize(os.path.join(self.cache_dir, name))
+                   for name in os.listdir(self.cache_dir) if name.endswith('.npz'))
@@ -0,0 +1,96 @@
+"""
+Prediction Instrumentation
+Opt-in stage timings, counters and model cache activity for a single
+prediction, attached to its result dict under "instrumentation". Can also
+write a cProfile trace of the run (open with snakeviz, or
+`python -m pstats`).
+
+Usage:
+    instrumentation = Instrumentation(enabled=True, profile_path="run.prof")
+    with instrumentation:
+        with instrumentation.stage("decode"):
+            ...
+        instrumentation.count("frames_decoded", 16)
+    result = instrumentation.attach(result)
+"""
+
+import cProfile
+import time
+from contextlib import contextmanager
+
+import model_registry
+
+
+class Instrumentation:
+    """
+    Collects per-stage wall time and counters; everything is a no-op
+    unless enabled (or a profile path is given)
+    """
+    def __init__(self, enabled=False, profile_path=None):
+        self.enabled = enabled or profile_path is not None
+        self.profile_path = profile_path
+        self.stages = {}
+        self.counts = {}
+        self._started = None
+        self._elapsed = None
+        self._registry_start = None
+        self._registry_end = None
+        self._profiler = None
+
+    def __enter__(self):
+        if self.enabled:
+            self._registry_start = model_registry.counters()
+            self._started = time.perf_counter()
+            if self.profile_path:
+                self._profiler = cProfile.Profile()
+                self._profiler.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self.enabled:
+            return False
+        if self._profiler is not None:
+            self._profiler.disable()
+            self._profiler.dump_stats(self.profile_path)
+        self._elapsed = time.perf_counter() - self._started
+        self._registry_end = model_registry.counters()
+        return False
+
+    @contextmanager
+    def stage(self, name):
+        """Time a block; repeated stages accumulate"""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def count(self, name, value=1):
+        if self.enabled:
+            self.counts[name] = self.counts.get(name, 0) + value
+
+    def report(self):
+        report = {
+            "stages_ms": {name: round(seconds * 1000, 3) for name, seconds in self.stages.items()},
+            "counts": dict(self.counts)
+        }
+        if self._elapsed is not None:
+            report["total_ms"] = round(self._elapsed * 1000, 3)
+        if self._registry_start is not None and self._registry_end is not None:
+            # Process-wide counters, so concurrent requests can show up here too
+            report["model_cache"] = {
+                key: self._registry_end[key] - self._registry_start[key]
+                for key in ("loads", "hits")
+            }
+        if self.profile_path:
+            report["profile"] = self.profile_path
+        return report
+
+    def attach(self, result):
+        """Add the report to a result dict (unchanged when disabled)"""
+        if self.enabled and isinstance(result, dict):
+            result["instrumentation"] = self.report()
+        return result
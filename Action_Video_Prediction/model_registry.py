@@ -0,0 +1,240 @@
+"""
+Model Registry
+Loads the YOLO pose model and the LSTM classifier once per process and
+shares them between predictions. Models are keyed by path, device and
+runtime, and loading is thread-safe.
+
+Runtimes (see export_models.py for producing the exported files):
+- eager: the PyTorch checkpoints as trained
+- quantized: dynamic int8 quantization of the LSTM and Linear layers (CPU);
+  the pose model stays eager
+- torchscript: <model>.torchscript and <pose weights>.torchscript
+- onnx: <model>.onnx run with ONNX Runtime, <pose weights>.onnx
+
+Bare pose weight names (the default 'yolo11n-pose.pt') live in this
+directory, whichever directory a script runs from, so the exports made here
+are found by Live_Action too.
+"""
+
+import io
+import os
+import threading
+
+import numpy as np
+import torch
+import torch.nn as nn
+from ultralytics import YOLO
+
+DEFAULT_POSE_WEIGHTS = 'yolo11n-pose.pt'
+POSE_WEIGHTS_DIR = os.path.dirname(os.path.abspath(__file__))
+RUNTIMES = ('eager', 'quantized', 'torchscript', 'onnx')
+EXPORT_SUFFIXES = {'torchscript': '.torchscript', 'onnx': '.onnx'}
+
+_lock = threading.RLock()
+_models = {}
+_stats = {"loads": 0, "hits": 0}
+
+
+def _resolve(path):
+    # Bare names like 'yolo11n-pose.pt' are resolved (and downloaded) by ultralytics
+    return os.path.abspath(path) if os.path.exists(path) else path
+
+
+def resolve_pose_weights(weights=DEFAULT_POSE_WEIGHTS):
+    """
+    Absolute path of the pose weights: bare names resolve to POSE_WEIGHTS_DIR
+    (ultralytics downloads them there when missing), unless only a copy in
+    the current directory exists
+    """
+    if os.path.dirname(weights):
+        return os.path.abspath(weights)
+    shared = os.path.join(POSE_WEIGHTS_DIR, weights)
+    if not os.path.exists(shared) and os.path.exists(weights):
+        return os.path.abspath(weights)
+    return shared
+
+
+def _get_or_load(key, loader):
+    with _lock:
+        model = _models.get(key)
+        if model is not None:
+            _stats["hits"] += 1
+            return model
+        model = loader()
+        _models[key] = model
+        _stats["loads"] += 1
+        return model
+
+
+def export_path(path, runtime):
+    """Where the exported copy of a checkpoint lives for a runtime"""
+    return os.path.splitext(path)[0] + EXPORT_SUFFIXES[runtime]
+
+
+def pose_model_path(weights=DEFAULT_POSE_WEIGHTS, runtime='eager'):
+    """The pose weights file actually loaded for a runtime"""
+    weights = resolve_pose_weights(weights)
+    return export_path(weights, runtime) if runtime in EXPORT_SUFFIXES else weights
+
+
+def _check_runtime(runtime, device):
+    if runtime not in RUNTIMES:
+        raise ValueError(f"Unknown runtime '{runtime}', expected one of {RUNTIMES}")
+    if runtime in ('quantized', 'onnx') and device != 'cpu':
+        raise ValueError(f"Runtime '{runtime}' only supports device 'cpu'")
+
+
+def _exported(path, runtime):
+    exported = export_path(path, runtime)
+    if not os.path.exists(exported):
+        raise FileNotFoundError(
+            f"No {runtime} export found at {exported}; run export_models.py first"
+        )
+    return os.path.abspath(exported)
+
+
+def get_pose_model(weights=DEFAULT_POSE_WEIGHTS, device='cpu', runtime='eager'):
+    """Return the shared YOLO pose model for (weights, device, runtime)"""
+    _check_runtime(runtime, device)
+    weights = resolve_pose_weights(weights)
+    if runtime in EXPORT_SUFFIXES:
+        # ultralytics picks the backend from the exported file's suffix
+        weights = _exported(weights, runtime)
+        return _get_or_load(("pose", weights, device),
+                            lambda: YOLO(weights, task='pose'))
+    return _get_or_load(("pose", weights, device), lambda: YOLO(weights))
+
+
+class OnnxClassifier:
+    """ONNX Runtime session with the call signature of the torch classifier"""
+    def __init__(self, path):
+        import onnxruntime as ort
+        self.session = ort.InferenceSession(path, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+        self.nbytes = os.path.getsize(path)
+
+    def __call__(self, x):
+        inputs = x.detach().cpu().numpy().astype(np.float32, copy=False)
+        return torch.from_numpy(self.session.run(None, {self.input_name: inputs})[0])
+
+    def eval(self):
+        return self
+
+
+def load_eager_classifier(model_path, model_cls, device='cpu', **model_kwargs):
+    """Build model_cls from a .pth state dict, in eval mode (not cached)"""
+    model = model_cls(**model_kwargs)
+    model.load_state_dict(torch.load(model_path, map_location=device))
+    model.eval()
+    model.to(device)
+    return model
+
+
+def quantize_classifier(model):
+    """Dynamic int8 quantization of the LSTM and Linear layers"""
+    return torch.ao.quantization.quantize_dynamic(
+        model, {nn.LSTM, nn.Linear}, dtype=torch.qint8
+    )
+
+
+def get_classifier(model_path, model_cls, device='cpu', runtime='eager', **model_kwargs):
+    """
+    Return the shared classifier for (model_path, device, runtime), in eval mode
+
+    Args:
+        model_path: Path to the .pth state dict (exported runtimes load the
+            file next to it, see export_path)
+        model_cls: nn.Module class to instantiate (e.g. KeypointLSTMClassifier)
+        device: 'cpu' or 'cuda'
+        runtime: One of RUNTIMES
+        **model_kwargs: Constructor arguments for model_cls
+    """
+    _check_runtime(runtime, device)
+    model_path = _resolve(model_path)
+
+    def load():
+        if runtime == 'torchscript':
+            return torch.jit.load(_exported(model_path, runtime), map_location=device).eval()
+        if runtime == 'onnx':
+            return OnnxClassifier(_exported(model_path, runtime))
+        model = load_eager_classifier(model_path, model_cls, device=device, **model_kwargs)
+        if runtime == 'quantized':
+            model = quantize_classifier(model)
+        return model
+
+    # Qualified class name: predict_action and live_predict each define a
+    # KeypointLSTMClassifier, and the live one adds forward_step
+    key = ("classifier", model_path, device, runtime,
+           f"{model_cls.__module__}.{model_cls.__qualname__}",
+           tuple(sorted(model_kwargs.items())))
+    return _get_or_load(key, load)
+
+
+def warm_up(model_path=None, model_cls=None, pose_weights=DEFAULT_POSE_WEIGHTS,
+            device='cpu', seq_length=16, feature_dim=51, runtime='eager', **model_kwargs):
+    """
+    Load the models and run one dummy inference through each, so the first
+    real request does not pay for lazy initialization
+    """
+    pose_model = get_pose_model(pose_weights, device=device, runtime=runtime)
+    dummy_frame = np.zeros((640, 640, 3), dtype=np.uint8)
+    pose_model(dummy_frame, imgsz=640, device=device, verbose=False)
+
+    if model_path is not None and model_cls is not None:
+        model = get_classifier(model_path, model_cls, device=device, runtime=runtime,
+                               **model_kwargs)
+        with torch.no_grad():
+            model(torch.zeros(1, seq_length, feature_dim, device=device))
+
+
+def _module_bytes(module):
+    if any('quantized' in type(m).__module__ for m in module.modules()):
+        # Packed int8 weights are not parameters; measure the serialized size
+        buffer = io.BytesIO()
+        torch.save(module.state_dict(), buffer)
+        return buffer.tell()
+    tensors = list(module.parameters()) + list(module.buffers())
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+
+def model_bytes(model):
+    """Size of a loaded model's weights (file size for ONNX sessions)"""
+    if isinstance(model, OnnxClassifier):
+        return model.nbytes
+    module = model if isinstance(model, nn.Module) else getattr(model, 'model', None)
+    return _module_bytes(module) if isinstance(module, nn.Module) else 0
+
+
+def memory_usage():
+    """Return {model key: bytes of parameters and buffers} for loaded models"""
+    usage = {}
+    with _lock:
+        for key, model in _models.items():
+            name = f"{key[0]}:{key[1]}@{key[2]}"
+            if key[0] == "classifier":
+                name += f"/{key[3]}/{key[4]}"
+            usage[name] = model_bytes(model)
+    return usage
+
+
+def counters():
+    """Return the load/hit counters only (cheap, no memory walk)"""
+    with _lock:
+        return dict(_stats)
+
+
+def stats():
+    """Return load/hit counters and total model memory"""
+    with _lock:
+        counters = dict(_stats)
+        counters["models"] = len(_models)
+    counters["memory_bytes"] = sum(memory_usage().values())
+    return counters
+
+
+def clear():
+    """Drop all cached models"""
+    with _lock:
+        _models.clear()
+        _stats["loads"] = 0
+        _stats["hits"] = 0
@@ -6,15 +6,21 @@ Uses trained LSTM model to predict DriveBackhand or DriveForehand from video
 import os
 import sys
 import json
+import time
 import argparse
 import numpy as np
 import cv2
 import torch
 import torch.nn as nn
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from ultralytics import YOLO
 from tqdm import tqdm
 
+import model_registry
+from feature_cache import FeatureCache
+from instrumentation import Instrumentation
+
 # Model architecture
 class KeypointLSTMClassifier(nn.Module):
     def __init__(self, feature_dim=51, hidden=128, num_layers=1,
@@ -39,59 +45,454 @@ class KeypointLSTMClassifier(nn.Module):
         return self.classifier(h)
 
 
+SAMPLING_STRATEGIES = ('uniform', 'motion', 'shot', 'head')
+
+
+def read_video_metadata(video_path):
+    """Return (total_frames, fps) from the container without decoding"""
+    cap = cv2.VideoCapture(video_path)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
+    return total_frames, fps
+
+
 class AdaptiveKeyframeExtractor:
-    """Extract 16 keyframes from video"""
-    def __init__(self, target_frames=16):
+    """
+    Pick 16 keyframe indices spanning the clip
+
+    Strategies:
+    - uniform: evenly spaced over the whole clip (container metadata only)
+    - motion: denser where a low-resolution motion pass sees more movement
+    - shot: uniform inside the most active shot, ignoring cuts to other shots
+    - head: first 16 frames (the sampling the LSTM was trained with)
+    """
+    def __init__(self, target_frames=16, strategy='uniform', motion_stride=2,
+                 motion_width=64, shot_threshold=0.5):
+        if strategy not in SAMPLING_STRATEGIES:
+            raise ValueError(f"Unknown sampling strategy: {strategy}")
         self.target_frames = target_frames
+        self.strategy = strategy
+        self.motion_stride = motion_stride  # Analyse every n-th frame
+        self.motion_width = motion_width  # Width of the low-resolution pass
+        self.shot_threshold = shot_threshold  # Histogram distance for a cut
+
+    def signature(self):
+        """Settings that determine the picked frames (feature cache key)"""
+        return (f"{self.strategy}:{self.target_frames}:{self.motion_stride}:"
+                f"{self.motion_width}:{self.shot_threshold}")
 
     def extract_frame_indices(self, video_path):
-        cap = cv2.VideoCapture(video_path)
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        duration = total_frames / fps if fps > 0 else 0
-        cap.release()
-
-        if duration > 0:
-            indices = list(range(total_frames))
-            if len(indices) == 0:
-                return []
-            if len(indices) < self.target_frames:
-                repeat_factor = self.target_frames / len(indices)
-                new_indices = []
-                for i in indices:
-                    n_repeats = int(np.ceil(repeat_factor))
-                    new_indices.extend([i] * n_repeats)
-                indices = new_indices[:self.target_frames]
+        total_frames, fps = read_video_metadata(video_path)
+        if total_frames <= 0 or fps <= 0:
+            return []
+
+        if self.strategy == 'head':
+            return self._head_indices(total_frames)
+        if self.strategy == 'uniform' or total_frames <= self.target_frames:
+            return self._uniform_indices(0, total_frames)
+
+        sample_indices, energy, cut_scores = self._motion_profile(video_path)
+        if len(sample_indices) < 2:
+            return self._uniform_indices(0, total_frames)
+        if self.strategy == 'motion':
+            return self._motion_indices(sample_indices, energy)
+        return self._shot_indices(sample_indices, energy, cut_scores, total_frames)
+
+    def _head_indices(self, total_frames):
+        indices = list(range(min(total_frames, self.target_frames)))
+        if len(indices) < self.target_frames:
+            # Repeat frames to reach target
+            n_repeats = int(np.ceil(self.target_frames / len(indices)))
+            indices = [i for i in indices for _ in range(n_repeats)]
         return indices[:self.target_frames]
 
+    def _uniform_indices(self, start, stop):
+        # Short ranges repeat indices, matching the old repeat behaviour
+        positions = np.linspace(start, stop - 1, self.target_frames)
+        return [int(i) for i in np.round(positions)]
+
+    def _motion_profile(self, video_path):
+        """
+        Cheap low-resolution pass over every motion_stride-th frame
+
+        Returns:
+            sample indices, motion energy per sample (mean abs difference to
+            the previous sample), histogram distance per sample (cut score)
+        """
+        cap = cv2.VideoCapture(video_path)
+        sample_indices, energy, cut_scores = [], [], []
+        prev_gray, prev_hist = None, None
+        idx = 0
+        try:
+            while True:
+                if idx % self.motion_stride != 0:
+                    if not cap.grab():
+                        break
+                    idx += 1
+                    continue
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                h, w = frame.shape[:2]
+                small = cv2.resize(frame, (self.motion_width, max(1, h * self.motion_width // w)),
+                                   interpolation=cv2.INTER_AREA)
+                gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+                hist = cv2.calcHist([gray], [0], None, [32], [0, 256])
+                cv2.normalize(hist, hist)
+                if prev_gray is None:
+                    energy.append(0.0)
+                    cut_scores.append(0.0)
+                else:
+                    energy.append(float(cv2.absdiff(gray, prev_gray).mean()))
+                    cut_scores.append(cv2.compareHist(prev_hist, hist, cv2.HISTCMP_BHATTACHARYYA))
+                sample_indices.append(idx)
+                prev_gray, prev_hist = gray, hist
+                idx += 1
+        finally:
+            cap.release()
+        return np.array(sample_indices), np.array(energy), np.array(cut_scores)
+
+    def _motion_indices(self, sample_indices, energy):
+        # Inverse-CDF sampling of motion energy; the floor keeps some
+        # coverage of still stretches so the sequence stays ordered in time
+        weights = energy + max(energy.mean() * 0.1, 1e-6)
+        cdf = np.cumsum(weights)
+        cdf /= cdf[-1]
+        quantiles = (np.arange(self.target_frames) + 0.5) / self.target_frames
+        positions = np.searchsorted(cdf, quantiles)
+        return [int(sample_indices[min(p, len(sample_indices) - 1)]) for p in positions]
+
+    def _shot_indices(self, sample_indices, energy, cut_scores, total_frames):
+        # Split at histogram cuts and keep the shot with the most motion
+        cuts = np.flatnonzero(cut_scores > self.shot_threshold)
+        bounds = [0, *cuts.tolist(), len(sample_indices)]
+        best_start, best_stop, best_energy = 0, len(sample_indices), -1.0
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            if stop <= start:
+                continue
+            # Energy at a cut measures the cut itself, not motion
+            shot_energy = energy[start + 1:stop].sum()
+            if shot_energy > best_energy:
+                best_start, best_stop, best_energy = start, stop, shot_energy
+        first = int(sample_indices[best_start])
+        if best_stop < len(sample_indices):
+            last = int(sample_indices[best_stop]) - 1
+        else:
+            last = total_frames - 1
+        return self._uniform_indices(first, last + 1)
+
+
+class VideoFrameSource:
+    """Decode a video once, front to back, returning only the selected frames"""
+    def __init__(self, video_path):
+        self.video_path = video_path
+
+    def read_frames(self, frame_indices):
+        """
+        Yield (index, frame) for every requested index in ascending order.
+        Skipped frames are only grabbed (not decoded to BGR), and repeated
+        indices are yielded once per occurrence. frame is None if the video
+        ended before that index.
+        """
+        wanted = Counter(frame_indices)
+        cap = cv2.VideoCapture(self.video_path)
+        try:
+            position = 0
+            exhausted = not cap.isOpened()
+            for idx in sorted(wanted):
+                frame = None
+                while not exhausted and position < idx:
+                    if not cap.grab():
+                        exhausted = True
+                    position += 1
+                if not exhausted:
+                    ret, frame = cap.read()
+                    position += 1
+                    if not ret:
+                        frame = None
+                        exhausted = True
+                for _ in range(wanted[idx]):
+                    yield idx, frame
+        finally:
+            cap.release()
+
 
 class KeypointExtractor:
     """Extract human pose keypoints using YOLO11 pose model"""
-    def __init__(self, device='cpu'):
-        self.model = YOLO('yolo11n-pose.pt')
+    def __init__(self, device='cpu', weights=model_registry.DEFAULT_POSE_WEIGHTS,
+                 runtime='eager'):
+        self.model = model_registry.get_pose_model(weights, device=device, runtime=runtime)
         self.device = device
         self.feature_dim = 51
 
     def extract(self, frame):
+        return self.extract_batch([frame])[0]
+
+    def extract_batch(self, frames):
+        """
+        Extract keypoints from several frames in one batched YOLO call
+
+        Returns:
+            np.array of shape (N, 51), zero rows where no person was found
+        """
+        features = np.zeros((len(frames), self.feature_dim), dtype=np.float32)
+        for i, people in enumerate(self.detect_batch(frames)):
+            if people:
+                # Most confident person
+                features[i] = people[0]["features"]
+        return features
+
+    def detect_batch(self, frames):
+        """
+        Detect every person in several frames in one batched YOLO call
+
+        Returns:
+            list (per frame) of lists of people, most confident first; each
+            person is {"box": [x1, y1, x2, y2] in pixels, "score": float,
+            "features": np.array (51,) normalized like extract()}
+        """
+        detections = [[] for _ in frames]
+        if len(frames) == 0:
+            return detections
         try:
-            results = self.model(frame, imgsz=640, device=self.device, verbose=False)
-            if len(results) == 0 or not hasattr(results[0], 'keypoints'):
-                return np.zeros(self.feature_dim, dtype=np.float32)
-            kpts = results[0].keypoints
-            if kpts is None or len(kpts) == 0:
-                return np.zeros(self.feature_dim, dtype=np.float32)
-            kpt_data = kpts.data[0].cpu().numpy()
-            h, w = frame.shape[:2]
-            kpt_data[:, 0] /= w
-            kpt_data[:, 1] /= h
-            features = kpt_data.flatten()
-            return features.astype(np.float32)
+            results = self.model(list(frames), imgsz=640, device=self.device, verbose=False)
+            for i, (frame, result) in enumerate(zip(frames, results)):
+                kpts = getattr(result, 'keypoints', None)
+                if kpts is None or len(kpts) == 0:
+                    continue
+                h, w = frame.shape[:2]
+                kpt_data = kpts.data.cpu().numpy()
+                boxes = result.boxes.xyxy.cpu().numpy()
+                scores = result.boxes.conf.cpu().numpy()
+                for kpt, box, score in zip(kpt_data, boxes, scores):
+                    kpt[:, 0] /= w
+                    kpt[:, 1] /= h
+                    detections[i].append({
+                        "box": box.tolist(),
+                        "score": float(score),
+                        "features": kpt.flatten().astype(np.float32)
+                    })
         except Exception as e:
             print(f"Keypoint extraction failed: {e}", file=sys.stderr)
-            return np.zeros(self.feature_dim, dtype=np.float32)
+            detections = [[] for _ in frames]
+        return detections
+
+
+def box_iou(a, b):
+    """IoU of two (x1, y1, x2, y2) boxes"""
+    ix = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def track_people(detections, frame_shapes, min_iou=0.1):
+    """
+    Link per-frame detections into person tracks by greedy IoU matching
+    against each track's latest box
+
+    Args:
+        detections: Output of KeypointExtractor.detect_batch
+        frame_shapes: (h, w) per frame, None for frames that failed to decode
+        min_iou: Minimum overlap to continue a track
+
+    Returns:
+        list of tracks sorted by selection score (active player first); each
+        track is {"player_id", "features": (N, 51) with zero rows where the
+        person was not seen, "frames_detected", "selection_score"}
+    """
+    n_frames = len(detections)
+    tracks = []
+    for i, people in enumerate(detections):
+        candidates = sorted(
+            ((box_iou(track["box"], person["box"]), t, p)
+             for t, track in enumerate(tracks)
+             for p, person in enumerate(people)),
+            reverse=True
+        )
+        used_tracks, used_people = set(), set()
+        for iou, t, p in candidates:
+            if iou < min_iou or t in used_tracks or p in used_people:
+                continue
+            used_tracks.add(t)
+            used_people.add(p)
+            tracks[t]["box"] = people[p]["box"]
+            tracks[t]["seen"][i] = people[p]
+        for p, person in enumerate(people):
+            if p not in used_people:
+                tracks.append({"box": person["box"], "seen": {i: person}})
+
+    results = []
+    for player_id, track in enumerate(tracks):
+        features = np.zeros((n_frames, 51), dtype=np.float32)
+        areas = []
+        for i, person in track["seen"].items():
+            features[i] = person["features"]
+            h, w = frame_shapes[i]
+            x1, y1, x2, y2 = person["box"]
+            areas.append((x2 - x1) * (y2 - y1) / (w * h))
+        results.append({
+            "player_id": player_id,
+            "features": features,
+            "frames_detected": len(track["seen"]),
+            "selection_score": _selection_score(features, track["seen"], areas, n_frames)
+        })
+    results.sort(key=lambda t: t["selection_score"], reverse=True)
+    return results
+
+
+def _selection_score(features, seen, areas, n_frames):
+    """
+    Active-player heuristic: players seen in more frames, larger in frame
+    and moving more (keypoint displacement between sightings) score higher
+    """
+    coverage = len(seen) / max(1, n_frames)
+    size = float(np.mean(areas)) if areas else 0.0
+    frames = sorted(seen)
+    motion = 0.0
+    if len(frames) > 1:
+        xy = features[frames].reshape(len(frames), 17, 3)[:, :, :2]
+        motion = float(np.abs(np.diff(xy, axis=0)).mean())
+    return round(float(coverage * np.sqrt(size) * (1.0 + 10.0 * motion)), 6)
+
+
+CLASS_NAMES = ['DriveBackhand', 'DriveForehand']
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".avi", ".mkv", ".webm")
+
+
+def load_classifier(model_path, device='cpu', runtime='eager'):
+    """Return the LSTM classifier (cached per process by the registry)"""
+    return model_registry.get_classifier(
+        model_path,
+        KeypointLSTMClassifier,
+        device=device,
+        runtime=runtime,
+        feature_dim=51,
+        hidden=128,
+        num_layers=1,
+        num_classes=2,
+        dropout=0.3
+    )
+
+
+def read_keyframes(video_path, keyframe_extractor):
+    """
+    Decode the keyframes of a video (single sequential pass)
+
+    Returns:
+        list of frames, None where the frame read failed
+    """
+    frame_indices = keyframe_extractor.extract_frame_indices(video_path)
+    frame_source = VideoFrameSource(video_path)
+    return [frame for _, frame in frame_source.read_frames(frame_indices)]
+
+
+def pad_sequence(features, target_frames=16):
+    """Pad (repeating the last frame) or truncate to target_frames"""
+    if len(features) == 0:
+        return np.zeros((target_frames, 51), dtype=np.float32)
+    if len(features) < target_frames:
+        padding = np.repeat(features[-1:], target_frames - len(features), axis=0)
+        return np.concatenate([features, padding])
+    return features[:target_frames]
+
+
+def detect_people(frames, keypoint_extractor):
+    """
+    Detect everyone in the decoded frames (one batch). Frames that failed
+    to decode are skipped.
+
+    Returns:
+        (detections per frame, (h, w) per frame or None), the input of
+        track_people and what FeatureCache stores
+    """
+    decoded = [i for i, frame in enumerate(frames) if frame is not None]
+    detections = [[] for _ in frames]
+    frame_shapes = [None for _ in frames]
+    if decoded:
+        for i, people in zip(decoded, keypoint_extractor.detect_batch([frames[i] for i in decoded])):
+            detections[i] = people
+            frame_shapes[i] = frames[i].shape[:2]
+    return detections, frame_shapes
+
+
+def extract_player_tracks(frames, keypoint_extractor):
+    """Detect everyone in the frames and link them into tracks; see track_people"""
+    return track_people(*detect_people(frames, keypoint_extractor))
+
+
+def active_player_features(tracks, n_frames, target_frames=16):
+    """Padded keypoint sequence of the top-ranked track, zeros if nobody was found"""
+    if tracks:
+        features = tracks[0]["features"]
+    else:
+        features = np.zeros((n_frames, 51), dtype=np.float32)
+    return pad_sequence(features, target_frames)
+
+
+def extract_features(frames, keypoint_extractor, target_frames=16):
+    """
+    Keypoint sequence of the active player (see track_people), padded or
+    truncated to target_frames
+
+    Returns:
+        np.array of shape (target_frames, 51)
+    """
+    tracks = extract_player_tracks(frames, keypoint_extractor)
+    return active_player_features(tracks, len(frames), target_frames)
+
+
+def cached_detections(feature_cache, video_path, keyframe_extractor,
+                      pose_weights=model_registry.DEFAULT_POSE_WEIGHTS, runtime='eager'):
+    """
+    Look up a video's detections in the feature cache
+
+    Returns:
+        (cache key, (detections, frame_shapes) or None on a miss)
+    """
+    key = feature_cache.key(
+        video_path,
+        model_registry.pose_model_path(pose_weights, runtime),
+        runtime,
+        keyframe_extractor.signature()
+    )
+    return key, feature_cache.get(key)
+
+
+def classify_batch(features_batch, model, device='cpu'):
+    """Run the LSTM on (B, 16, 51) feature sequences and format each result"""
+    features_tensor = torch.from_numpy(np.ascontiguousarray(features_batch)).to(device)
+    
+    with torch.no_grad():
+        output = model(features_tensor)
+        probabilities = torch.softmax(output, dim=1).cpu().numpy()
+    
+    results = []
+    for probs in probabilities:
+        predicted_class = int(probs.argmax())
+        results.append({
+            "success": True,
+            "predicted_class": CLASS_NAMES[predicted_class],
+            "class_index": predicted_class,
+            "confidence": round(float(probs[predicted_class]) * 100, 2),
+            "probabilities": {
+                "DriveBackhand": round(float(probs[0]) * 100, 2),
+                "DriveForehand": round(float(probs[1]) * 100, 2)
+            },
+            "frames_processed": features_batch.shape[1]
+        })
+    return results
+
 
+def classify_features(features, model, device='cpu'):
+    """Run the LSTM on a (16, 51) feature sequence and format the result"""
+    return classify_batch(features[np.newaxis], model, device=device)[0]
 
-def predict_video(video_path, model_path, device='cpu'):
+
+def predict_video(video_path, model_path, device='cpu', sampling='uniform', all_players=False,
+                  runtime='eager', feature_cache=None, instrument=False, profile_path=None):
     """
     Predict action class from video
     
@@ -99,97 +500,229 @@ def predict_video(video_path, model_path, device='cpu'):
         video_path: Path to video file
         model_path: Path to model .pth file
         device: 'cpu' or 'cuda'
+        sampling: Keyframe sampling strategy (see AdaptiveKeyframeExtractor)
+        all_players: Also classify every tracked person (batched), listed
+            under "players"; the top-level result is always the active player
+        runtime: Model runtime (see model_registry.RUNTIMES)
+        feature_cache: Optional FeatureCache; on a hit decoding and pose
+            estimation are skipped (result has "cache_hit")
+        instrument: Attach stage timings, frame counts and model cache
+            activity under "instrumentation"
+        profile_path: Also write a cProfile trace of this call here
     
     Returns:
         dict with prediction results
     """
+    instrumentation = Instrumentation(enabled=instrument, profile_path=profile_path)
     try:
-        # Initialize components
-        keyframe_extractor = AdaptiveKeyframeExtractor(target_frames=16)
-        keypoint_extractor = KeypointExtractor(device=device)
+        with instrumentation:
+            result = _predict_video(video_path, model_path, device, sampling, all_players,
+                                    runtime, feature_cache, instrumentation)
+    except Exception as e:
+        import traceback
+        result = {
+            "success": False,
+            "error": str(e),
+            "traceback": traceback.format_exc()
+        }
+    return instrumentation.attach(result)
+
+
+def _predict_video(video_path, model_path, device, sampling, all_players, runtime,
+                   feature_cache, instrumentation):
+    keyframe_extractor = AdaptiveKeyframeExtractor(target_frames=16, strategy=sampling)
+    
+    cached = None
+    if feature_cache is not None:
+        with instrumentation.stage("cache_lookup"):
+            cache_key, cached = cached_detections(feature_cache, video_path,
+                                                  keyframe_extractor, runtime=runtime)
+    
+    if cached is not None:
+        detections, frame_shapes = cached
+    else:
+        with instrumentation.stage("model_load"):
+            keypoint_extractor = KeypointExtractor(device=device, runtime=runtime)
         
         # Extract keyframes
-        frame_indices = keyframe_extractor.extract_frame_indices(video_path)
-        if len(frame_indices) == 0:
+        with instrumentation.stage("frame_selection"):
+            frame_indices = keyframe_extractor.extract_frame_indices(video_path)
+        with instrumentation.stage("decode"):
+            frames = [frame for _, frame in VideoFrameSource(video_path).read_frames(frame_indices)]
+        instrumentation.count("frames_selected", len(frame_indices))
+        instrumentation.count("frames_decoded", sum(frame is not None for frame in frames))
+        if len(frames) == 0:
             return {
                 "success": False,
                 "error": "No frames extracted from video"
             }
         
-        # Extract keypoints from frames
-        cap = cv2.VideoCapture(video_path)
-        features = []
-        
-        for idx in frame_indices:
-            cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
-            ret, frame = cap.read()
-            if ret:
-                kpt_features = keypoint_extractor.extract(frame)
-                features.append(kpt_features)
-            else:
-                # Use zeros if frame read fails
-                features.append(np.zeros(51, dtype=np.float32))
+        with instrumentation.stage("pose"):
+            detections, frame_shapes = detect_people(frames, keypoint_extractor)
+        if feature_cache is not None:
+            with instrumentation.stage("cache_store"):
+                feature_cache.put(cache_key, detections, frame_shapes)
+    instrumentation.count("detections", sum(len(people) for people in detections))
+    
+    # Keypoint sequences per tracked person
+    with instrumentation.stage("tracking"):
+        tracks = track_people(detections, frame_shapes)
+    with instrumentation.stage("model_load"):
+        model = load_classifier(model_path, device=device, runtime=runtime)
+    cache_info = {"cache_hit": cached is not None} if feature_cache is not None else {}
+    
+    if not tracks:
+        features = active_player_features(tracks, len(frame_shapes))
+        with instrumentation.stage("lstm"):
+            result = classify_features(features, model, device=device)
+        result.update({"player_id": None, "people_detected": 0, **cache_info})
+        return result
+    
+    # Predict (active player first, optionally everyone in one batch)
+    selected = tracks if all_players else tracks[:1]
+    features_batch = np.stack([pad_sequence(t["features"]) for t in selected])
+    with instrumentation.stage("lstm"):
+        player_results = classify_batch(features_batch, model, device=device)
+    for track, player_result in zip(selected, player_results):
+        player_result.update({
+            "player_id": track["player_id"],
+            "frames_detected": track["frames_detected"],
+            "selection_score": track["selection_score"]
+        })
+    
+    result = dict(player_results[0])
+    result["people_detected"] = len(tracks)
+    result.update(cache_info)
+    if all_players:
+        result["players"] = player_results
+    return result
+
+
+def detect_actions(video_path, model_path, device='cpu', window=16, stride=4,
+                   frame_step=1, min_confidence=60.0, batch_size=32, runtime='eager'):
+    """
+    Detect strokes over a full rally video with overlapping windows
+    
+    Every frame_step-th frame is pose-estimated exactly once (in batches),
+    and the cached per-frame keypoints are shared by all windows covering
+    that frame. The windows are then classified in batched LSTM calls.
+    
+    Args:
+        video_path: Path to video file
+        model_path: Path to model .pth file
+        device: 'cpu' or 'cuda'
+        window: Frames per classified window (sequence length of the LSTM)
+        stride: Windows start every `stride` sampled frames
+        frame_step: Pose-estimate every n-th frame of the video
+        min_confidence: Minimum window confidence (%) to count as a stroke
+        batch_size: Frames per batched YOLO call
+        runtime: Model runtime (see model_registry.RUNTIMES)
+    
+    Returns:
+        dict with a timeline of detected strokes
+    """
+    try:
+        _, fps = read_video_metadata(video_path)
+        if fps <= 0:
+            fps = 30.0
+        keypoint_extractor = KeypointExtractor(device=device, runtime=runtime)
+        model = load_classifier(model_path, device=device, runtime=runtime)
         
-        cap.release()
+        # Decode sequentially, pose-estimating each sampled frame once
+        frame_indices, chunks, batch = [], [], []
+        cap = cv2.VideoCapture(video_path)
+        idx = 0
+        try:
+            while True:
+                if idx % frame_step != 0:
+                    if not cap.grab():
+                        break
+                    idx += 1
+                    continue
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                batch.append(frame)
+                frame_indices.append(idx)
+                if len(batch) == batch_size:
+                    chunks.append(keypoint_extractor.extract_batch(batch))
+                    batch = []
+                idx += 1
+        finally:
+            cap.release()
+        if batch:
+            chunks.append(keypoint_extractor.extract_batch(batch))
         
-        if len(features) == 0:
+        if not chunks:
             return {
                 "success": False,
-                "error": "Failed to extract features from video"
+                "error": "No frames extracted from video"
             }
         
-        # Pad or truncate to 16 frames
-        target_frames = 16
-        if len(features) < target_frames:
+        features = np.concatenate(chunks)
+        n_frames = len(features)
+        if n_frames < window:
             # Repeat last frame
-            last_frame = features[-1]
-            while len(features) < target_frames:
-                features.append(last_frame.copy())
-        else:
-            features = features[:target_frames]
-        
-        # Convert to tensor
-        features_array = np.array(features, dtype=np.float32)
-        features_tensor = torch.tensor(features_array).unsqueeze(0).to(device)
+            padding = np.repeat(features[-1:], window - n_frames, axis=0)
+            features = np.concatenate([features, padding])
         
-        # Load model
-        model = KeypointLSTMClassifier(
-            feature_dim=51,
-            hidden=128,
-            num_layers=1,
-            num_classes=2,
-            dropout=0.3
-        )
+        # Window start positions; always include a window ending at the last frame
+        starts = list(range(0, len(features) - window + 1, stride))
+        if starts[-1] != len(features) - window:
+            starts.append(len(features) - window)
+        starts = np.array(starts)
+        windows = features[starts[:, None] + np.arange(window)]
         
-        model.load_state_dict(torch.load(model_path, map_location=device))
-        model.eval()
-        model.to(device)
+        # Fraction of frames per window where a person was detected
+        person_present = features[:, 2::3].max(axis=1) > 0
+        presence = person_present[starts[:, None] + np.arange(window)].mean(axis=1)
         
-        # Predict
+        # Classify all windows in batched LSTM calls
+        probabilities = []
         with torch.no_grad():
-            output = model(features_tensor)
-            probabilities = torch.softmax(output, dim=1)
-            predicted_class = output.argmax(1).item()
-            confidence = probabilities[0][predicted_class].item()
+            for i in range(0, len(windows), 64):
+                chunk = torch.from_numpy(windows[i:i + 64]).to(device)
+                probabilities.append(torch.softmax(model(chunk), dim=1).cpu().numpy())
+        probabilities = np.concatenate(probabilities)
         
-        # Class names
-        class_names = ['DriveBackhand', 'DriveForehand']
-        predicted_name = class_names[predicted_class]
+        # Merge overlapping confident windows of the same class into strokes
+        detections = []
+        current = None
+        for start, probs, present in zip(starts, probabilities, presence):
+            class_index = int(probs.argmax())
+            confidence = float(probs[class_index]) * 100
+            first = frame_indices[min(start, n_frames - 1)]
+            last = frame_indices[min(start + window, n_frames) - 1]
+            if confidence < min_confidence or present < 0.5:
+                current = None
+                continue
+            if (current is not None and current["class_index"] == class_index
+                    and first <= current["end_frame"]):
+                current["end_frame"] = last
+                current["confidence"] = max(current["confidence"], confidence)
+                current["windows"] += 1
+                continue
+            current = {
+                "action": CLASS_NAMES[class_index],
+                "class_index": class_index,
+                "start_frame": first,
+                "end_frame": last,
+                "confidence": confidence,
+                "windows": 1
+            }
+            detections.append(current)
         
-        # Get probabilities for both classes
-        prob_backhand = probabilities[0][0].item()
-        prob_forehand = probabilities[0][1].item()
+        for detection in detections:
+            detection["start_time"] = round(detection["start_frame"] / fps, 3)
+            detection["end_time"] = round(detection["end_frame"] / fps, 3)
+            detection["confidence"] = round(detection["confidence"], 2)
         
         return {
             "success": True,
-            "predicted_class": predicted_name,
-            "class_index": predicted_class,
-            "confidence": round(confidence * 100, 2),
-            "probabilities": {
-                "DriveBackhand": round(prob_backhand * 100, 2),
-                "DriveForehand": round(prob_forehand * 100, 2)
-            },
-            "frames_processed": len(features)
+            "fps": fps,
+            "frames_processed": n_frames,
+            "windows": len(starts),
+            "detections": detections
         }
         
     except Exception as e:
@@ -201,17 +734,172 @@ def predict_video(video_path, model_path, device='cpu'):
         }
 
 
+def collect_videos(batch_path):
+    """
+    List videos for batch mode: every video file in a directory, or the
+    paths in a manifest file (one per line, relative to the manifest)
+    """
+    if os.path.isdir(batch_path):
+        return [
+            os.path.join(batch_path, name)
+            for name in sorted(os.listdir(batch_path))
+            if name.lower().endswith(VIDEO_EXTENSIONS)
+        ]
+    
+    base_dir = os.path.dirname(os.path.abspath(batch_path))
+    videos = []
+    with open(batch_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                videos.append(os.path.join(base_dir, line))
+    return videos
+
+
+def predict_batch(video_paths, model_path, device='cpu', workers=2, sampling='uniform',
+                  runtime='eager', feature_cache=None):
+    """
+    Classify many videos in one process.
+
+    Decoding runs ahead on a pool of `workers` threads while pose extraction
+    and classification run on the calling thread, so the shared models are
+    never used concurrently. With a feature_cache, the decode workers look
+    videos up first and cached ones skip decoding and pose estimation.
+
+    Yields:
+        dict per video (in input order) with prediction results, the video
+        path and per-stage timings in seconds
+    """
+    keyframe_extractor = AdaptiveKeyframeExtractor(target_frames=16, strategy=sampling)
+    keypoint_extractor = KeypointExtractor(device=device, runtime=runtime)
+    model = load_classifier(model_path, device=device, runtime=runtime)
+    
+    def decode(video_path):
+        start = time.perf_counter()
+        cache_key = cached = None
+        if feature_cache is not None:
+            cache_key, cached = cached_detections(feature_cache, video_path,
+                                                  keyframe_extractor, runtime=runtime)
+        frames = None
+        if cached is None:
+            frames = read_keyframes(video_path, keyframe_extractor)
+        return frames, cache_key, cached, time.perf_counter() - start
+    
+    workers = max(1, workers)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = []
+        remaining = iter(video_paths)
+        
+        def submit_next():
+            video_path = next(remaining, None)
+            if video_path is not None:
+                pending.append((video_path, pool.submit(decode, video_path)))
+        
+        # Keep a bounded number of decoded videos in flight
+        for _ in range(workers * 2):
+            submit_next()
+        
+        while pending:
+            video_path, future = pending.pop(0)
+            submit_next()
+            timings = {}
+            try:
+                frames, cache_key, cached, timings["decode_s"] = future.result()
+                if cached is None and len(frames) == 0:
+                    result = {
+                        "success": False,
+                        "error": "No frames extracted from video"
+                    }
+                else:
+                    start = time.perf_counter()
+                    if cached is None:
+                        cached = detect_people(frames, keypoint_extractor)
+                        if feature_cache is not None:
+                            feature_cache.put(cache_key, *cached)
+                    detections, frame_shapes = cached
+                    tracks = track_people(detections, frame_shapes)
+                    features = active_player_features(tracks, len(frame_shapes))
+                    timings["pose_s"] = time.perf_counter() - start
+                    
+                    start = time.perf_counter()
+                    result = classify_features(features, model, device=device)
+                    timings["classify_s"] = time.perf_counter() - start
+                    if feature_cache is not None:
+                        result["cache_hit"] = frames is None
+            except Exception as e:
+                result = {
+                    "success": False,
+                    "error": str(e)
+                }
+            
+            yield {
+                "video_path": video_path,
+                **result,
+                "timings": {k: round(v, 4) for k, v in timings.items()}
+            }
+
+
+def run_batch(batch_path, model_path, device='cpu', workers=2, output_path=None,
+              sampling='uniform', runtime='eager', feature_cache=None):
+    """Batch CLI mode: stream one JSON object per video"""
+    if not os.path.exists(batch_path):
+        print(json.dumps({
+            "success": False,
+            "error": f"Batch path not found: {batch_path}"
+        }))
+        sys.exit(1)
+    
+    video_paths = collect_videos(batch_path)
+    out = open(output_path, 'w', encoding='utf-8') if output_path else sys.stdout
+    failures = 0
+    try:
+        for result in predict_batch(video_paths, model_path, device=device,
+                                    workers=workers, sampling=sampling, runtime=runtime,
+                                    feature_cache=feature_cache):
+            if not result.get("success"):
+                failures += 1
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    
+    if failures:
+        sys.exit(1)
+
+
 def main():
     parser = argparse.ArgumentParser(description="Predict action from video")
-    parser.add_argument("video_path", help="Path to video file")
+    parser.add_argument("video_path", nargs="?", help="Path to video file")
     parser.add_argument("--model", help="Path to model file")
     parser.add_argument("--device", default="cpu", choices=["cpu", "cuda"], help="Device to use")
+    parser.add_argument("--sampling", default="uniform", choices=SAMPLING_STRATEGIES,
+                        help="Keyframe sampling strategy ('head' = first 16 frames, as in training)")
+    parser.add_argument("--all_players", action="store_true",
+                        help="Classify every tracked person, not just the active player")
+    parser.add_argument("--timeline", action="store_true",
+                        help="Detect strokes over a full rally video with sliding windows")
+    parser.add_argument("--stride", type=int, default=4, help="Window stride in --timeline mode")
+    parser.add_argument("--frame_step", type=int, default=1,
+                        help="Pose-estimate every n-th frame in --timeline mode")
+    parser.add_argument("--batch", help="Directory of videos or manifest file (one path per line); "
+                                        "results are streamed as JSON Lines")
+    parser.add_argument("--workers", type=int, default=2, help="Decode workers in batch mode")
+    parser.add_argument("--output", help="Write batch results to this file instead of stdout")
+    parser.add_argument("--runtime", default="eager", choices=model_registry.RUNTIMES,
+                        help="Model runtime; torchscript/onnx need export_models.py first")
+    parser.add_argument("--cache_dir",
+                        help="Cache pose keypoints per video here, so re-classifying skips YOLO")
+    parser.add_argument("--cache_max_mb", type=float, default=512,
+                        help="Evict least recently used cache entries above this size")
+    parser.add_argument("--instrument", action="store_true",
+                        help="Add stage timings, frame counts and model cache hits to the result")
+    parser.add_argument("--profile", help="Write a cProfile trace of the prediction to this file")
     
     args = parser.parse_args()
     
     # Get absolute paths
     script_dir = os.path.dirname(os.path.abspath(__file__))
-    video_path = os.path.abspath(args.video_path)
     
     # Find model file
     if args.model:
@@ -220,24 +908,50 @@ def main():
         # Default: look in script directory
         model_path = os.path.join(script_dir, "Model_2dongtac.pth")
     
-    if not os.path.exists(video_path):
+    if not args.batch and not args.video_path:
+        parser.error("video_path is required unless --batch is given")
+    
+    if not os.path.exists(model_path):
         result = {
             "success": False,
-            "error": f"Video file not found: {video_path}"
+            "error": f"Model file not found: {model_path}"
         }
         print(json.dumps(result, indent=2))
         sys.exit(1)
     
-    if not os.path.exists(model_path):
+    feature_cache = None
+    if args.cache_dir:
+        feature_cache = FeatureCache(args.cache_dir, max_bytes=int(args.cache_max_mb * 1024 * 1024))
+    
+    if args.batch:
+        run_batch(args.batch, model_path, args.device, args.workers, args.output,
+                  sampling=args.sampling, runtime=args.runtime, feature_cache=feature_cache)
+        return
+    
+    video_path = os.path.abspath(args.video_path)
+    
+    if not os.path.exists(video_path):
         result = {
             "success": False,
-            "error": f"Model file not found: {model_path}"
+            "error": f"Video file not found: {video_path}"
         }
         print(json.dumps(result, indent=2))
         sys.exit(1)
     
     # Predict
-    result = predict_video(video_path, model_path, device=args.device)
+    if args.timeline:
+        result = detect_actions(video_path, model_path, device=args.device,
+                                stride=args.stride, frame_step=args.frame_step,
+                                runtime=args.runtime)
+        print(json.dumps(result, indent=2))
+        if not result.get("success"):
+            sys.exit(1)
+        return
+    
+    result = predict_video(video_path, model_path, device=args.device, sampling=args.sampling,
+                           all_players=args.all_players, runtime=args.runtime,
+                           feature_cache=feature_cache, instrument=args.instrument,
+                           profile_path=args.profile)
     print(json.dumps(result, indent=2))
     
     if not result.get("success"):
@@ -3,16 +3,66 @@ import json
 import math
 from typing import List
 
+import numpy as np
+
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vision.pose_store import POSE_INDEX_FILE, has_pose_store, read_pose_store
+
+# Landmarks used by the phase rules
+PHASE_LANDMARKS = ["RIGHT_SHOULDER", "RIGHT_ELBOW", "RIGHT_WRIST", "RIGHT_HIP"]
+
 
 def load_poses(folder: str) -> List[dict]:
+    """
+    Load a session's poses as {"frame", "landmarks"} dicts, from the pose
+    store or, for older sessions, the per-frame JSON files.
+    """
+    if has_pose_store(folder):
+        names, poses, landmark_names = read_pose_store(folder)
+        return [
+            {
+                "frame": name,
+                "landmarks": {
+                    landmark: [round(float(value), 5) for value in row]
+                    for landmark, row in zip(landmark_names, pose)
+                }
+            }
+            for name, pose in zip(names, poses)
+        ]
+
     frames = []
     for file in sorted(os.listdir(folder)):
-        if file.endswith(".json"):
+        if file.endswith(".json") and file != POSE_INDEX_FILE:
             with open(os.path.join(folder, file)) as f:
                 frames.append(json.load(f))
     return frames
 
 
+def load_pose_array(folder: str):
+    """
+    Load a session's poses as an array for detect_phases_array().
+
+    Returns:
+        (frame_names, poses, landmark_names): the pose store as-is (memory
+        mapped), or for older JSON-only sessions just the phase landmarks
+    """
+    if has_pose_store(folder):
+        return read_pose_store(folder)
+    return poses_to_array(load_poses(folder))
+
+
+def poses_to_array(pose_frames: List[dict]):
+    """(frame_names, (frames, 4, 4) array, PHASE_LANDMARKS) from pose dicts."""
+    names = [frame["frame"] for frame in pose_frames]
+    poses = np.array(
+        [[frame["landmarks"][name] for name in PHASE_LANDMARKS] for frame in pose_frames],
+        dtype=np.float64
+    ).reshape(len(pose_frames), len(PHASE_LANDMARKS), 4)
+    return names, poses, PHASE_LANDMARKS
+
+
 def angle(a, b, c) -> float:
     """
     Compute angle at point b between points a and c.
@@ -29,47 +79,74 @@ def angle(a, b, c) -> float:
     return math.degrees(math.acos(max(-1, min(1, dot / mag))))
 
 
-def detect_phases(pose_frames: List[dict]) -> List[dict]:
-    results = []
-
-    prev_wrist_x = None
-
-    for i, frame in enumerate(pose_frames):
-        lm = frame["landmarks"]
-
-        shoulder = lm["RIGHT_SHOULDER"]
-        elbow = lm["RIGHT_ELBOW"]
-        wrist = lm["RIGHT_WRIST"]
-        hip = lm["RIGHT_HIP"]
-
-        elbow_angle = angle(shoulder, elbow, wrist)
+def angles(a: np.ndarray, b: np.ndarray, c: np.ndarray) -> np.ndarray:
+    """
+    angle() over arrays of (x, y) points: the angle at each b between a and c.
+    """
+    ba = a - b
+    bc = c - b
 
-        wrist_x = wrist[0]
-        wrist_vel = 0 if prev_wrist_x is None else wrist_x - prev_wrist_x
+    dot = ba[:, 0] * bc[:, 0] + ba[:, 1] * bc[:, 1]
+    mag = np.sqrt(ba[:, 0]**2 + ba[:, 1]**2) * np.sqrt(bc[:, 0]**2 + bc[:, 1]**2)
 
-        # ---- Phase rules ----
-        if abs(wrist_vel) < 0.002:
-            phase = "READY"
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cosine = np.clip(dot / mag, -1, 1)
+    return np.where(mag == 0, 0.0, np.degrees(np.arccos(cosine)))
 
-        elif wrist_vel < -0.002:
-            phase = "BACKSWING"
 
-        elif elbow_angle > 160 and abs(wrist_vel) > 0.01:
-            phase = "CONTACT"
+def detect_phases_array(frame_names: List[str], poses, landmark_names: List[str]) -> List[dict]:
+    """
+    Phase records for a whole sequence at once.
 
-        else:
-            phase = "FOLLOW_THROUGH"
+    Args:
+        frame_names: One name per frame
+        poses: (frames, landmarks, 4) array of x, y, z, visibility
+        landmark_names: Landmark order of the second axis
 
-        results.append({
-            "frame": frame["frame"],
-            "phase": phase,
-            "elbow_angle": round(elbow_angle, 1),
-            "wrist_velocity": round(wrist_vel, 4)
-        })
+    Returns:
+        Same records as detect_phases()
+    """
+    if len(frame_names) == 0:
+        return []
+
+    columns = [landmark_names.index(name) for name in ("RIGHT_SHOULDER", "RIGHT_ELBOW", "RIGHT_WRIST")]
+    # Only the (x, y) of the landmarks used, at the 5-decimal precision
+    # the per-frame JSON has always held
+    xy = np.round(np.asarray(poses[:, columns, :2], dtype=np.float64), 5)
+
+    shoulder = xy[:, 0]
+    elbow = xy[:, 1]
+    wrist = xy[:, 2]
+
+    elbow_angle = angles(shoulder, elbow, wrist)
+    wrist_vel = np.diff(wrist[:, 0], prepend=wrist[0, 0])
+
+    # ---- Phase rules ----
+    speed = np.abs(wrist_vel)
+    phase = np.select(
+        [speed < 0.002, wrist_vel < -0.002, (elbow_angle > 160) & (speed > 0.01)],
+        ["READY", "BACKSWING", "CONTACT"],
+        default="FOLLOW_THROUGH"
+    )
+
+    results = [
+        {
+            "frame": name,
+            "phase": label,
+            "elbow_angle": round(angle_deg, 1),
+            "wrist_velocity": round(vel, 4)
+        }
+        for name, label, angle_deg, vel in zip(
+            frame_names, phase.tolist(), elbow_angle.tolist(), wrist_vel.tolist()
+        )
+    ]
+    # The first frame has no previous wrist position
+    results[0]["wrist_velocity"] = 0
+    return results
 
-        prev_wrist_x = wrist_x
 
-    return results
+def detect_phases(pose_frames: List[dict]) -> List[dict]:
+    return detect_phases_array(*poses_to_array(pose_frames))
 
 
 def save_phases(phases, output_path):
@@ -83,8 +160,7 @@ if __name__ == "__main__":
 
     os.makedirs(os.path.dirname(output_file), exist_ok=True)
 
-    frames = load_poses(poses_dir)
-    phases = detect_phases(frames)
+    phases = detect_phases_array(*load_pose_array(poses_dir))
     save_phases(phases, output_file)
 
     print("Drive forehand phases detected")
@@ -9,10 +9,11 @@ from typing import Optional
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
-from vision.frame_extractor import extract_frames
-from vision.pose_estimation import process_frame_folder
-from analysis.drive_forehand_phase import load_poses, detect_phases, save_phases
+from vision.pipeline import extract_poses_from_video
+from vision.pose_estimation import warm_up_pose_estimator
+from analysis.drive_forehand_phase import load_pose_array, detect_phases_array, save_phases
 from analysis.drive_forehand_rule import evaluate_shadow_drive_forehand
+from api.job_queue import analysis_queue, QueueFullError
 
 router = APIRouter(prefix="/api", tags=["analysis"])
 
@@ -36,77 +37,68 @@ def get_session_paths(session_id: str):
     }
 
 
-@router.post("/analyze-video")
-async def analyze_video(request: AnalyzeRequest):
+class AnalysisError(Exception):
+    """Pipeline failure with the HTTP status to report it with."""
+
+    def __init__(self, detail: str, status_code: int = 500):
+        super().__init__(detail, status_code)
+        self.detail = detail
+        self.status_code = status_code
+
+
+def init_analysis_worker():
+    """
+    Job queue worker initializer: build the worker's pose estimator up front
+    so analysis requests skip model download, graph construction and load.
+    """
+    try:
+        warm_up_pose_estimator(video_mode=True)
+    except Exception as e:
+        # Leave the worker usable; the first job will report the error
+        print(f"Pose estimator warm-up failed: {e}")
+
+
+def run_pipeline(session_id: str, skill: str, video_path: str) -> dict:
     """
-    Run the full analysis pipeline on an uploaded video.
+    Run the full analysis pipeline on a session's video.
+    
+    Runs in a job queue worker process (module-level so it can be pickled).
     
     Pipeline steps:
-    1. Extract frames from video (sharpness-based)
-    2. Extract pose landmarks from frames
+    1-2. Select frames (sharpness-based) and extract their pose landmarks,
+         in memory (frames are saved only with CHATBOX_SAVE_FRAMES=1)
     3. Detect phases (READY, BACKSWING, CONTACT, FOLLOW_THROUGH)
     4. Evaluate phases and generate feedback
     
-    Returns:
-        - success: Whether analysis completed
-        - feedback_path: Path to feedback JSON file
-        - frame_count: Number of frames extracted
+    Raises:
+        AnalysisError: When a step produces nothing to continue with
     """
-    session_id = request.session_id
-    skill = request.skill
-    
     paths = get_session_paths(session_id)
     
-    # Check if video exists
-    video_dir = paths["video_dir"]
-    if not os.path.exists(video_dir):
-        raise HTTPException(status_code=404, detail=f"Session {session_id} not found")
-    
-    # Find video file
-    video_files = [f for f in os.listdir(video_dir) 
-                   if f.lower().endswith((".mp4", ".mov", ".avi", ".mkv", ".webm"))]
-    
-    if not video_files:
-        raise HTTPException(status_code=404, detail="No video file found in session")
-    
-    video_path = os.path.join(video_dir, video_files[0])
-    
     try:
-        # Step 1: Extract frames
-        os.makedirs(paths["frame_dir"], exist_ok=True)
-        frame_count = extract_frames(
+        # Steps 1-2: Extract frames and their pose landmarks
+        counts = extract_poses_from_video(
             video_path=video_path,
-            output_dir=paths["frame_dir"],
+            pose_dir=paths["pose_dir"],
+            frame_dir=paths["frame_dir"],
             seconds_interval=1.0,
             burst_size=7,
             keep_top_k=2
         )
+        frame_count = counts["frame_count"]
         
         if frame_count == 0:
-            raise HTTPException(
-                status_code=500,
-                detail="Failed to extract frames from video"
-            )
-        
-        # Step 2: Extract pose landmarks
-        os.makedirs(paths["pose_dir"], exist_ok=True)
-        process_frame_folder(
-            frame_dir=paths["frame_dir"],
-            output_dir=paths["pose_dir"]
-        )
+            raise AnalysisError("Failed to extract frames from video")
         
         # Check if any poses were detected
-        pose_files = [f for f in os.listdir(paths["pose_dir"]) if f.endswith(".json")]
-        if not pose_files:
-            raise HTTPException(
-                status_code=500,
-                detail="No pose detected in any frame. Please ensure person is visible in video."
+        if counts["pose_count"] == 0:
+            raise AnalysisError(
+                "No pose detected in any frame. Please ensure person is visible in video."
             )
         
         # Step 3: Detect phases
         os.makedirs(os.path.dirname(paths["phase_file"]), exist_ok=True)
-        pose_frames = load_poses(paths["pose_dir"])
-        phases = detect_phases(pose_frames)
+        phases = detect_phases_array(*load_pose_array(paths["pose_dir"]))
         save_phases(phases, paths["phase_file"])
         
         # Step 4: Evaluate phases and generate feedback
@@ -122,22 +114,115 @@ async def analyze_video(request: AnalyzeRequest):
         with open(paths["feedback_file"], "w", encoding="utf-8") as f:
             json.dump(feedback, f, indent=2)
         
-        return JSONResponse({
+        return {
             "success": True,
             "session_id": session_id,
             "skill": skill,
             "frame_count": frame_count,
-            "pose_count": len(pose_files),
+            "pose_count": counts["pose_count"],
             "phase_count": len(phases),
             "feedback_path": paths["feedback_file"],
             "message": "Analysis completed successfully"
-        })
+        }
     
-    except HTTPException:
+    except AnalysisError:
         raise
     except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Analysis failed: {str(e)}"
+        raise AnalysisError(f"Analysis failed: {str(e)}")
+
+
+@router.post("/analyze-video", status_code=202)
+async def analyze_video(request: AnalyzeRequest):
+    """
+    Queue the analysis pipeline (see run_pipeline) for an uploaded video.
+    
+    The work runs in a bounded process pool; poll the status endpoint and
+    fetch the result when the job is completed. Analyzing a session that
+    already has an unfinished job returns that job.
+    
+    Returns:
+        - success: Whether the job was queued
+        - job_id: Id for the status/result endpoints
+        - status: queued, running, completed or failed
+        - status_url, result_url: Where to poll
+    """
+    session_id = request.session_id
+    skill = request.skill
+    
+    paths = get_session_paths(session_id)
+    
+    # Check if video exists
+    video_dir = paths["video_dir"]
+    if not os.path.exists(video_dir):
+        raise HTTPException(status_code=404, detail=f"Session {session_id} not found")
+    
+    # Find video file
+    video_files = [f for f in os.listdir(video_dir) 
+                   if f.lower().endswith((".mp4", ".mov", ".avi", ".mkv", ".webm"))]
+    
+    if not video_files:
+        raise HTTPException(status_code=404, detail="No video file found in session")
+    
+    video_path = os.path.join(video_dir, video_files[0])
+    
+    try:
+        job = analysis_queue.submit(
+            run_pipeline, session_id, skill, video_path,
+            key=f"{session_id}:{skill}",
+            session_id=session_id,
+            skill=skill
         )
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    
+    job_id = job["job_id"]
+    return JSONResponse(status_code=202, content={
+        "success": True,
+        **analysis_queue.describe(job),
+        "status_url": f"/api/analyze-video/{job_id}",
+        "result_url": f"/api/analyze-video/{job_id}/result"
+    })
+
+
+def _get_job(job_id: str):
+    job = analysis_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
 
+@router.get("/analyze-video/{job_id}")
+async def analysis_status(job_id: str):
+    """Status of an analysis job (queued, running, completed, failed)."""
+    job = _get_job(job_id)
+    summary = analysis_queue.describe(job)
+    if summary["status"] == "failed":
+        error = job["future"].exception()
+        summary["error"] = error.detail if isinstance(error, AnalysisError) else str(error)
+    return JSONResponse({"success": True, **summary})
+
+
+@router.get("/analyze-video/{job_id}/result")
+async def analysis_result(job_id: str):
+    """
+    Result of a finished analysis job.
+    
+    Returns 202 with the job status while it is still queued or running,
+    the pipeline's result when completed, and the pipeline's error status
+    when it failed.
+    """
+    job = _get_job(job_id)
+    future = job["future"]
+    if not future.done():
+        return JSONResponse(status_code=202, content={
+            "success": True,
+            **analysis_queue.describe(job)
+        })
+    
+    error = future.exception()
+    if error is not None:
+        if isinstance(error, AnalysisError):
+            raise HTTPException(status_code=error.status_code, detail=error.detail)
+        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(error)}")
+    
+    return JSONResponse({"job_id": job_id, **future.result()})
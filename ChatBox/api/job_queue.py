@@ -0,0 +1,163 @@
+import os
+import time
+import uuid
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Pool size and how many jobs may wait for a worker
+ANALYSIS_WORKERS = int(os.getenv("CHATBOX_ANALYSIS_WORKERS", "2"))
+ANALYSIS_QUEUE_SIZE = int(os.getenv("CHATBOX_ANALYSIS_QUEUE_SIZE", "8"))
+# Finished jobs are kept this long for status/result polling
+JOB_TTL_SECONDS = int(os.getenv("CHATBOX_JOB_TTL", "3600"))
+
+
+def _noop():
+    time.sleep(0.1)
+
+
+class QueueFullError(Exception):
+    """Raised when every worker is busy and the wait queue is full."""
+
+
+class JobQueue:
+    """
+    Bounded process pool for CPU-heavy jobs, tracked by job id.
+
+    Jobs run in worker processes so OpenCV/MediaPipe work never blocks the
+    API's event loop; the caller polls status() and gets the return value
+    (or the raised exception) from the job record.
+    """
+
+    def __init__(self, max_workers: int = ANALYSIS_WORKERS,
+                 max_queued: int = ANALYSIS_QUEUE_SIZE, job_ttl: int = JOB_TTL_SECONDS):
+        self.max_workers = max(1, max_workers)
+        self.max_queued = max(0, max_queued)
+        self.job_ttl = job_ttl
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self._executor = None
+        self._initializer = None
+
+    def _pool(self):
+        if self._executor is None:
+            # spawn: forking a server process with live threads is unsafe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=self._initializer
+            )
+        return self._executor
+
+    def start(self, initializer=None):
+        """
+        Create the worker pool now instead of on the first job.
+
+        Args:
+            initializer: Module-level function run once in each worker
+                process (e.g. to load models); also used for pools
+                recreated after a crash
+        """
+        with self.lock:
+            self._initializer = initializer
+            pool = self._pool()
+            # Workers are spawned on demand; occupy them all once so every
+            # process starts (and runs the initializer) before real jobs
+            for _ in range(self.max_workers):
+                pool.submit(_noop)
+
+    def submit(self, fn, *args, key: str = None, **info):
+        """
+        Queue fn(*args) in a worker process.
+
+        Args:
+            fn: Module-level (picklable) function
+            key: Optional dedup key; an unfinished job with the same key is
+                returned instead of queueing a duplicate
+            **info: Extra fields stored on the job record (e.g. session_id)
+
+        Returns:
+            The job record (dict)
+
+        Raises:
+            QueueFullError: When max_workers + max_queued jobs are unfinished
+        """
+        with self.lock:
+            self._evict_finished()
+            active = [job for job in self.jobs.values() if not job["future"].done()]
+            if key is not None:
+                for job in active:
+                    if job["key"] == key:
+                        return job
+            if len(active) >= self.max_workers + self.max_queued:
+                raise QueueFullError(
+                    f"Analysis queue is full ({len(active)} jobs pending), try again later"
+                )
+
+            job_id = str(uuid.uuid4())
+            job = {
+                "job_id": job_id,
+                "key": key,
+                "created_at": time.time(),
+                "finished_at": None,
+                "future": None,
+                **info
+            }
+            try:
+                future = self._pool().submit(fn, *args)
+            except BrokenProcessPool:
+                # A worker died (e.g. a native crash); start a fresh pool
+                self._executor = None
+                future = self._pool().submit(fn, *args)
+            job["future"] = future
+            future.add_done_callback(lambda _: job.update(finished_at=time.time()))
+            self.jobs[job_id] = job
+            return job
+
+    def get(self, job_id: str):
+        """Return the job record, or None if unknown or expired."""
+        with self.lock:
+            self._evict_finished()
+            return self.jobs.get(job_id)
+
+    @staticmethod
+    def status(job) -> str:
+        """queued, running, completed or failed."""
+        future = job["future"]
+        if not future.done():
+            return "running" if future.running() else "queued"
+        return "failed" if future.exception() is not None else "completed"
+
+    def describe(self, job) -> dict:
+        """JSON-safe summary of a job (without its result)."""
+        summary = {key: value for key, value in job.items() if key not in ("future", "key")}
+        summary["status"] = self.status(job)
+        if summary["finished_at"] is not None:
+            summary["duration_s"] = round(summary["finished_at"] - summary["created_at"], 3)
+        return summary
+
+    def stats(self) -> dict:
+        with self.lock:
+            counts = {}
+            for job in self.jobs.values():
+                status = self.status(job)
+                counts[status] = counts.get(status, 0) + 1
+        return {"workers": self.max_workers, "max_queued": self.max_queued, "jobs": counts}
+
+    def shutdown(self):
+        with self.lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def _evict_finished(self):
+        now = time.time()
+        expired = [job_id for job_id, job in self.jobs.items()
+                   if job["finished_at"] is not None and now - job["finished_at"] > self.job_ttl]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+
+# Shared queue for the API process
+analysis_queue = JobQueue()
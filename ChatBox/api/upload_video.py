@@ -1,77 +1,177 @@
 import os
 import uuid
-from fastapi import APIRouter, UploadFile, File, HTTPException
+import shutil
+import hashlib
+from fastapi import APIRouter, UploadFile, File, HTTPException, Request
 from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
 from typing import Optional
 
-router = APIRouter(prefix="/api", tags=["upload"])
-
 # Base data directory
 BASE_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "data")
 VIDEO_DIR = os.path.join(BASE_DATA_DIR, "video")
+# sha256 -> session_id of the first upload with that content (for dedup)
+UPLOAD_INDEX_DIR = os.path.join(BASE_DATA_DIR, "upload_index")
+
+MAX_UPLOAD_BYTES = 50 * 1024 * 1024
+# Allowance for multipart boundaries and form fields around the file
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+CHUNK_SIZE = 1024 * 1024
+
+
+def _too_large():
+    return HTTPException(
+        status_code=413,
+        detail=f"File too large. Maximum {MAX_UPLOAD_BYTES // (1024 * 1024)}MB."
+    )
+
+
+class SizeLimitedRequest(Request):
+    """Request whose body stream fails as soon as it passes the upload limit."""
+
+    async def stream(self):
+        received = 0
+        async for chunk in super().stream():
+            received += len(chunk)
+            if received > MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES:
+                raise _too_large()
+            yield chunk
+
+
+class UploadLimitRoute(APIRoute):
+    """
+    Rejects oversized uploads before the multipart body is parsed: from
+    Content-Length when the client sends it, otherwise while streaming.
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def limited_handler(request: Request):
+            length = request.headers.get("content-length", "")
+            if length.isdigit() and int(length) > MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES:
+                raise _too_large()
+            return await handler(SizeLimitedRequest(request.scope, request.receive))
+
+        return limited_handler
+
+
+router = APIRouter(prefix="/api", tags=["upload"], route_class=UploadLimitRoute)
+
+
+def _find_duplicate(sha256: str):
+    """Session id of an earlier upload with the same content, if it still exists."""
+    index_file = os.path.join(UPLOAD_INDEX_DIR, sha256)
+    if not os.path.exists(index_file):
+        return None
+    with open(index_file, "r", encoding="utf-8") as f:
+        session_id = f.read().strip()
+    if session_id and os.path.isdir(os.path.join(VIDEO_DIR, session_id)):
+        return session_id
+    return None
+
+
+def _record_upload(sha256: str, session_id: str):
+    os.makedirs(UPLOAD_INDEX_DIR, exist_ok=True)
+    with open(os.path.join(UPLOAD_INDEX_DIR, sha256), "w", encoding="utf-8") as f:
+        f.write(session_id)
 
 
 @router.post("/upload-video")
 async def upload_video(
     file: UploadFile = File(...),
-    skill: Optional[str] = "drive_forehand"
+    skill: Optional[str] = "drive_forehand",
+    dedup: bool = False
 ):
     """
     Upload a video file (3-5 seconds) for analysis.
-    
+
+    The file is copied to disk in chunks while it is hashed, so memory use
+    does not grow with file size. With dedup=true, re-uploading a video
+    that is already stored returns the existing session instead.
+
     Returns:
         - session_id: Unique identifier for this analysis session
         - skill: The skill being analyzed
         - filename: Original filename
+        - sha256: Content hash of the video
+        - duplicate: Whether an existing session was returned (dedup only)
     """
-    
+
     # Validate file type
     if not file.filename:
         raise HTTPException(status_code=400, detail="No filename provided")
-    
+
     allowed_extensions = {".mp4", ".mov", ".avi", ".mkv", ".webm"}
     file_ext = os.path.splitext(file.filename.lower())[1]
-    
+
     if file_ext not in allowed_extensions:
         raise HTTPException(
             status_code=400,
             detail=f"Invalid file type. Allowed: {', '.join(allowed_extensions)}"
         )
-    
+
     # Generate unique session ID
     session_id = str(uuid.uuid4())
-    
+
     # Create session directory
     session_video_dir = os.path.join(VIDEO_DIR, session_id)
     os.makedirs(session_video_dir, exist_ok=True)
-    
-    # Save video file
+
+    # Save video file (written under a temporary name until complete)
     video_filename = f"video{file_ext}"
     video_path = os.path.join(session_video_dir, video_filename)
-    
+    partial_path = video_path + ".part"
+
     try:
-        # Read and save file
-        contents = await file.read()
-        
-        # Basic size check (e.g., max 50MB)
-        if len(contents) > 50 * 1024 * 1024:
-            raise HTTPException(status_code=400, detail="File too large. Maximum 50MB.")
-        
-        with open(video_path, "wb") as f:
-            f.write(contents)
-        
+        digest = hashlib.sha256()
+        size = 0
+        with open(partial_path, "wb") as f:
+            while True:
+                chunk = await file.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise _too_large()
+                digest.update(chunk)
+                f.write(chunk)
+
+        if size == 0:
+            raise HTTPException(status_code=400, detail="Uploaded file is empty")
+
+        sha256 = digest.hexdigest()
+        if dedup:
+            existing_session = _find_duplicate(sha256)
+            if existing_session is not None:
+                shutil.rmtree(session_video_dir, ignore_errors=True)
+                return JSONResponse({
+                    "success": True,
+                    "session_id": existing_session,
+                    "skill": skill,
+                    "filename": file.filename,
+                    "sha256": sha256,
+                    "duplicate": True,
+                    "message": "Video already uploaded"
+                })
+
+        os.replace(partial_path, video_path)
+        _record_upload(sha256, session_id)
+
         return JSONResponse({
             "success": True,
             "session_id": session_id,
             "skill": skill,
             "filename": file.filename,
+            "sha256": sha256,
+            "duplicate": False,
             "message": "Video uploaded successfully"
         })
-    
+
+    except HTTPException:
+        shutil.rmtree(session_video_dir, ignore_errors=True)
+        raise
     except Exception as e:
         # Clean up on error
-        if os.path.exists(video_path):
-            os.remove(video_path)
+        shutil.rmtree(session_video_dir, ignore_errors=True)
         raise HTTPException(status_code=500, detail=f"Failed to save video: {str(e)}")
-
-
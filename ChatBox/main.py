@@ -1,17 +1,33 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
 # Import API routers
 from api.upload_video import router as upload_router
-from api.analyze_video import router as analyze_router
+from api.analyze_video import router as analyze_router, init_analysis_worker
 from api.chat import router as chat_router
+from api.job_queue import analysis_queue
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Start the analysis worker pool with the server and stop it on exit.
+    Each worker warms up its pose estimator before taking jobs.
+    """
+    analysis_queue.start(initializer=init_analysis_worker)
+    yield
+    analysis_queue.shutdown()
+
 
 # Create FastAPI app
 app = FastAPI(
     title="Pickleball Training Chatbot API",
     description="API for video analysis and coaching feedback",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -42,7 +58,7 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
-    return {"status": "healthy"}
+    return {"status": "healthy", "analysis_queue": analysis_queue.stats()}
 
 
 if __name__ == "__main__":
@@ -49,9 +49,9 @@ if missing_packages:
 # Add current directory to path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from vision.frame_extractor import extract_frames
-from vision.pose_estimation import process_frame_folder
-from analysis.drive_forehand_phase import load_poses, detect_phases, save_phases
+from vision.pipeline import extract_poses_from_video, SAVE_FRAMES
+from vision.pose_estimation import POSE_WORKERS
+from analysis.drive_forehand_phase import load_pose_array, detect_phases_array, save_phases
 from analysis.drive_forehand_rule import evaluate_shadow_drive_forehand
 from llm.prompt_builder import build_llm_messages
 from llm.llm_client import get_llm_response
@@ -60,7 +60,8 @@ from llm.llm_client import get_llm_response
 BASE_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
 
 
-def run_analysis(video_path: str, skill: str = "drive_forehand", output_dir: str = None):
+def run_analysis(video_path: str, skill: str = "drive_forehand", output_dir: str = None,
+                 save_frames: bool = SAVE_FRAMES, pose_workers: int = POSE_WORKERS):
     """
     Run full analysis pipeline on a video file.
     
@@ -68,6 +69,8 @@ def run_analysis(video_path: str, skill: str = "drive_forehand", output_dir: str
         video_path: Path to input video file
         skill: Skill name (default: "drive_forehand")
         output_dir: Optional output directory (default: creates session_id folder)
+        save_frames: Also write the selected frames as JPEGs (debugging)
+        pose_workers: Processes for pose estimation (1 = sequential)
     
     Returns:
         dict: Analysis results with session_id, feedback, coaching_feedback, etc.
@@ -95,17 +98,22 @@ def run_analysis(video_path: str, skill: str = "drive_forehand", output_dir: str
     shutil.copy2(video_path, session_video_path)
     
     try:
-        # Step 1: Extract frames
+        # Steps 1-2: Extract frames and their pose landmarks (in memory;
+        # frames are written to frame_dir only with --save_frames)
         frame_dir = os.path.join(BASE_DATA_DIR, "frame", session_id)
-        os.makedirs(frame_dir, exist_ok=True)
+        pose_dir = os.path.join(BASE_DATA_DIR, "pose", session_id)
         
-        frame_count = extract_frames(
+        counts = extract_poses_from_video(
             video_path=session_video_path,
-            output_dir=frame_dir,
+            pose_dir=pose_dir,
+            frame_dir=frame_dir,
+            save_frames=save_frames,
             seconds_interval=1.0,
             burst_size=7,
-            keep_top_k=2
+            keep_top_k=2,
+            pose_workers=pose_workers
         )
+        frame_count = counts["frame_count"]
         
         if frame_count == 0:
             return {
@@ -114,18 +122,8 @@ def run_analysis(video_path: str, skill: str = "drive_forehand", output_dir: str
                 "session_id": session_id
             }
         
-        # Step 2: Extract pose landmarks
-        pose_dir = os.path.join(BASE_DATA_DIR, "pose", session_id)
-        os.makedirs(pose_dir, exist_ok=True)
-        
-        process_frame_folder(
-            frame_dir=frame_dir,
-            output_dir=pose_dir
-        )
-        
         # Check if any poses were detected
-        pose_files = [f for f in os.listdir(pose_dir) if f.endswith(".json")]
-        if not pose_files:
+        if counts["pose_count"] == 0:
             return {
                 "success": False,
                 "error": "No pose detected in any frame. Please ensure person is visible in video.",
@@ -137,8 +135,7 @@ def run_analysis(video_path: str, skill: str = "drive_forehand", output_dir: str
         phase_file = os.path.join(BASE_DATA_DIR, "phase", f"{session_id}_phases.json")
         os.makedirs(os.path.dirname(phase_file), exist_ok=True)
         
-        pose_frames = load_poses(pose_dir)
-        phases = detect_phases(pose_frames)
+        phases = detect_phases_array(*load_pose_array(pose_dir))
         save_phases(phases, phase_file)
         
         # Step 4: Evaluate phases and generate feedback
@@ -180,7 +177,7 @@ def run_analysis(video_path: str, skill: str = "drive_forehand", output_dir: str
             "session_id": session_id,
             "skill": skill,
             "frame_count": frame_count,
-            "pose_count": len(pose_files),
+            "pose_count": counts["pose_count"],
             "phase_count": len(phases),
             "techniques_detected": techniques_detected,
             "feedback": feedback,
@@ -206,10 +203,16 @@ def main():
     parser.add_argument("video_path", help="Path to video file")
     parser.add_argument("--skill", default="drive_forehand", help="Skill name (default: drive_forehand)")
     parser.add_argument("--output", help="Output directory (optional)")
+    parser.add_argument("--save_frames", action="store_true",
+                        help="Also save the selected frames as JPEGs (debugging)")
+    parser.add_argument("--pose_workers", type=int, default=POSE_WORKERS,
+                        help="Processes for pose estimation (default: CHATBOX_POSE_WORKERS or 1)")
     
     args = parser.parse_args()
     
-    result = run_analysis(args.video_path, args.skill, args.output)
+    result = run_analysis(args.video_path, args.skill, args.output,
+                          save_frames=args.save_frames or SAVE_FRAMES,
+                          pose_workers=args.pose_workers)
     
     # Output JSON result
     print(json.dumps(result, indent=2))
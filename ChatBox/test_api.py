@@ -14,6 +14,7 @@ import requests
 import json
 import os
 import sys
+import time
 
 # API base URL
 BASE_URL = "http://localhost:8000/api"
@@ -56,8 +57,8 @@ def test_upload_video(video_path: str, skill: str = "drive_forehand"):
             return None
 
 
-def test_analyze_video(session_id: str, skill: str = "drive_forehand"):
-    """Test video analysis endpoint."""
+def test_analyze_video(session_id: str, skill: str = "drive_forehand", timeout: float = 300):
+    """Test video analysis endpoint (queue the job, then poll for the result)."""
     print("\n" + "="*50)
     print("STEP 2: Analyzing video...")
     print("="*50)
@@ -72,6 +73,23 @@ def test_analyze_video(session_id: str, skill: str = "drive_forehand"):
         response = requests.post(url, json=data)
         response.raise_for_status()
         
+        job = response.json()
+        print(f"✓ Analysis queued")
+        print(f"  Job ID: {job['job_id']}")
+        
+        # Poll until the job is no longer queued/running
+        result_url = f"{BASE_URL}/analyze-video/{job['job_id']}/result"
+        deadline = time.time() + timeout
+        while True:
+            response = requests.get(result_url)
+            if response.status_code != 202:
+                break
+            if time.time() > deadline:
+                print(f"✗ Analysis timed out after {timeout:.0f}s")
+                return False
+            time.sleep(1)
+        response.raise_for_status()
+        
         result = response.json()
         print(f"✓ Analysis completed successfully")
         print(f"  Frames extracted: {result['frame_count']}")
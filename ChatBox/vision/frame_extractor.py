@@ -7,72 +7,111 @@ def sharpness_score(image) -> float:
     return cv2.Laplacian(gray, cv2.CV_64F).var()
 
 
-def extract_frames(
+def iter_timed_frames(
     video_path: str,
-    output_dir: str,
     seconds_interval: float = 1.0,
     burst_size: int = 7,
     keep_top_k: int = 2
-) -> int:
+):
     """
-    Extract best frames per burst using sharpness ranking.
+    Yield (frame_name, frame, timestamp_ms) for the best frames per burst
+    using sharpness ranking, decoded in memory (nothing is written to disk).
+    Frames come out in video order, so names sort chronologically and
+    timestamps strictly increase.
     """
 
     cap = cv2.VideoCapture(video_path)
     if not cap.isOpened():
         raise FileNotFoundError(f"Cannot open video: {video_path}")
 
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
 
-    print(f"FPS: {fps}")
-    print(f"Total frames: {total_frames}")
+        print(f"FPS: {fps}")
+        print(f"Total frames: {total_frames}")
 
-    if fps <= 0:
-        fps = 30
+        if fps <= 0:
+            fps = 30
 
-    os.makedirs(output_dir, exist_ok=True)
+        interval_frames = max(1, int(fps * seconds_interval))
 
-    interval_frames = max(1, int(fps * seconds_interval))
+        frame_idx = 0
+        # Index of the last decoded frame, for timestamps
+        position = -1
+        saved = 0
 
-    frame_idx = 0
-    saved = 0
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            position += 1
+
+            if frame_idx % interval_frames == 0:
+                burst = []
+
+                # Collect burst
+                for _ in range(burst_size):
+                    ret, frame = cap.read()
+                    if not ret:
+                        break
+                    position += 1
 
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
+                    score = sharpness_score(frame)
+                    burst.append((score, position, frame))
+                    frame_idx += 1
 
-        if frame_idx % interval_frames == 0:
-            burst = []
+                # Keep top-K frames by sharpness, then restore video order
+                burst.sort(key=lambda x: x[0], reverse=True)
+                best = sorted(burst[:keep_top_k], key=lambda x: x[1])
 
-            # Collect burst
-            for _ in range(burst_size):
-                ret, frame = cap.read()
-                if not ret:
-                    break
+                for score, index, frame in best:
+                    timestamp_ms = int(index * 1000 / fps)
+                    yield f"frame_{saved:04d}_sharp_{int(score)}.jpg", frame, timestamp_ms
+                    saved += 1
 
-                score = sharpness_score(frame)
-                burst.append((score, frame))
-                frame_idx += 1
+                continue
 
-            # Sort by sharpness (descending)
-            burst.sort(key=lambda x: x[0], reverse=True)
+            frame_idx += 1
+    finally:
+        cap.release()
 
-            # Keep top-K frames
-            for score, frame in burst[:keep_top_k]:
-                filename = f"frame_{saved:04d}_sharp_{int(score)}.jpg"
-                cv2.imwrite(
-                    os.path.join(output_dir, filename),
-                    frame
-                )
-                saved += 1
 
-            continue
+def iter_best_frames(
+    video_path: str,
+    seconds_interval: float = 1.0,
+    burst_size: int = 7,
+    keep_top_k: int = 2
+):
+    """
+    Yield (frame_name, frame) for the best frames per burst using sharpness
+    ranking, decoded in memory (nothing is written to disk).
+    """
+    for name, frame, _ in iter_timed_frames(video_path, seconds_interval, burst_size, keep_top_k):
+        yield name, frame
+
 
-        frame_idx += 1
+def extract_frames(
+    video_path: str,
+    output_dir: str,
+    seconds_interval: float = 1.0,
+    burst_size: int = 7,
+    keep_top_k: int = 2
+) -> int:
+    """
+    Extract best frames per burst using sharpness ranking and save them as JPEGs.
+    """
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    saved = 0
+    for filename, frame in iter_best_frames(video_path, seconds_interval, burst_size, keep_top_k):
+        cv2.imwrite(
+            os.path.join(output_dir, filename),
+            frame
+        )
+        saved += 1
 
-    cap.release()
     return saved
 
 
@@ -0,0 +1,54 @@
+"""
+Streaming video -> pose pipeline.
+
+Frames selected by the sharpness extractor go straight to pose estimation
+as decoded arrays; JPEGs are only written when debugging is enabled
+(save_frames=True or CHATBOX_SAVE_FRAMES=1). Since they all come from one
+clip, poses are tracked across them in video mode.
+"""
+import os
+import cv2
+
+from vision.frame_extractor import iter_timed_frames
+from vision.pose_estimation import process_frames, POSE_WORKERS
+
+SAVE_FRAMES = os.getenv("CHATBOX_SAVE_FRAMES", "0").lower() in ("1", "true", "yes")
+
+
+def extract_poses_from_video(
+    video_path: str,
+    pose_dir: str,
+    frame_dir: str = None,
+    save_frames: bool = SAVE_FRAMES,
+    seconds_interval: float = 1.0,
+    burst_size: int = 7,
+    keep_top_k: int = 2,
+    pose_workers: int = POSE_WORKERS
+) -> dict:
+    """
+    Select the sharpest frames of a video and save their pose landmarks.
+
+    Args:
+        video_path: Input video
+        pose_dir: Output folder for the pose store (poses.npy + poses_index.json)
+        frame_dir: Where to write the selected frames as JPEGs (debug)
+        save_frames: Write the JPEGs to frame_dir
+        pose_workers: Processes to spread pose estimation over
+            (default CHATBOX_POSE_WORKERS, 1 = in this process)
+
+    Returns:
+        dict with frame_count (frames selected) and pose_count (poses saved)
+    """
+    counts = {"frame_count": 0, "pose_count": 0}
+    if save_frames and frame_dir:
+        os.makedirs(frame_dir, exist_ok=True)
+
+    def frames():
+        for name, frame, timestamp_ms in iter_timed_frames(video_path, seconds_interval, burst_size, keep_top_k):
+            counts["frame_count"] += 1
+            if save_frames and frame_dir:
+                cv2.imwrite(os.path.join(frame_dir, name), frame)
+            yield name, frame, timestamp_ms
+
+    counts["pose_count"] = process_frames(frames(), pose_dir, video_mode=True, workers=pose_workers)
+    return counts
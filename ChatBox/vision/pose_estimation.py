@@ -1,6 +1,17 @@
 import cv2
 import os
 import json
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vision.pose_store import landmarks_to_array, write_pose_store
 
 # Try to use old API first (0.9.x), fallback to new API (0.10+) if needed
 try:
@@ -18,12 +29,26 @@ except AttributeError:
     mp_pose = None
 
 
-def extract_pose_from_frame(image_path: str, pose) -> dict | None:
+# Map index to landmark name (33 landmarks in MediaPipe Pose)
+LANDMARK_NAMES = [
+    "NOSE", "LEFT_EYE_INNER", "LEFT_EYE", "LEFT_EYE_OUTER", "RIGHT_EYE_INNER",
+    "RIGHT_EYE", "RIGHT_EYE_OUTER", "LEFT_EAR", "RIGHT_EAR", "MOUTH_LEFT",
+    "MOUTH_RIGHT", "LEFT_SHOULDER", "RIGHT_SHOULDER", "LEFT_ELBOW", "RIGHT_ELBOW",
+    "LEFT_WRIST", "RIGHT_WRIST", "LEFT_PINKY", "RIGHT_PINKY", "LEFT_INDEX",
+    "RIGHT_INDEX", "LEFT_THUMB", "RIGHT_THUMB", "LEFT_HIP", "RIGHT_HIP",
+    "LEFT_KNEE", "RIGHT_KNEE", "LEFT_ANKLE", "RIGHT_ANKLE", "LEFT_HEEL",
+    "RIGHT_HEEL", "LEFT_FOOT_INDEX", "RIGHT_FOOT_INDEX"
+]
+
+
+def extract_pose_from_image(image, pose, timestamp_ms: int = None) -> dict | None:
     """
-    Extract pose landmarks from a single image.
+    Extract pose landmarks from a decoded BGR image (numpy array).
     Compatible with both MediaPipe 0.9.x and 0.10+
+    
+    timestamp_ms is required for (and only used by) a 0.10+ estimator
+    created with video_mode=True.
     """
-    image = cv2.imread(image_path)
     if image is None:
         return None
 
@@ -31,9 +56,12 @@ def extract_pose_from_frame(image_path: str, pose) -> dict | None:
     
     if USE_NEW_API:
         # MediaPipe 0.10+ API
-        # Use file path directly - simpler and more reliable
-        mp_image = mp.Image.create_from_file(image_path)
-        detection_result = pose.detect(mp_image)
+        # Wrap the in-memory pixels, no re-read from disk
+        mp_image = mp.Image(image_format=ImageFormat.SRGB, data=image_rgb)
+        if timestamp_ms is None:
+            detection_result = pose.detect(mp_image)
+        else:
+            detection_result = pose.detect_for_video(mp_image, timestamp_ms)
         
         if not detection_result.pose_landmarks or len(detection_result.pose_landmarks) == 0:
             return None
@@ -45,19 +73,9 @@ def extract_pose_from_frame(image_path: str, pose) -> dict | None:
             return None
         
         landmarks = {}
-        # Map index to landmark name (33 landmarks in MediaPipe Pose)
-        landmark_names = [
-            "NOSE", "LEFT_EYE_INNER", "LEFT_EYE", "LEFT_EYE_OUTER", "RIGHT_EYE_INNER",
-            "RIGHT_EYE", "RIGHT_EYE_OUTER", "LEFT_EAR", "RIGHT_EAR", "MOUTH_LEFT",
-            "MOUTH_RIGHT", "LEFT_SHOULDER", "RIGHT_SHOULDER", "LEFT_ELBOW", "RIGHT_ELBOW",
-            "LEFT_WRIST", "RIGHT_WRIST", "LEFT_PINKY", "RIGHT_PINKY", "LEFT_INDEX",
-            "RIGHT_INDEX", "LEFT_THUMB", "RIGHT_THUMB", "LEFT_HIP", "RIGHT_HIP",
-            "LEFT_KNEE", "RIGHT_KNEE", "LEFT_ANKLE", "RIGHT_ANKLE", "LEFT_HEEL",
-            "RIGHT_HEEL", "LEFT_FOOT_INDEX", "RIGHT_FOOT_INDEX"
-        ]
         for idx, lm in enumerate(pose_landmarks_list):
-            if idx < len(landmark_names):
-                name = landmark_names[idx]
+            if idx < len(LANDMARK_NAMES):
+                name = LANDMARK_NAMES[idx]
             else:
                 name = f"LANDMARK_{idx}"
             landmarks[name] = [
@@ -86,15 +104,29 @@ def extract_pose_from_frame(image_path: str, pose) -> dict | None:
     return landmarks
 
 
-def process_frame_folder(
-    frame_dir: str,
-    output_dir: str
-):
-    os.makedirs(output_dir, exist_ok=True)
+def extract_pose_from_frame(image_path: str, pose) -> dict | None:
+    """
+    Extract pose landmarks from a single image file.
+    """
+    return extract_pose_from_image(cv2.imread(image_path), pose)
+
+
+MODEL_URL = "https://storage.googleapis.com/mediapipe-models/pose_landmarker/pose_landmarker_lite/float16/1/pose_landmarker_lite.task"
+
+_model_lock = threading.Lock()
+_model_path = None
+
+
+def get_pose_model_path() -> str:
+    """
+    Path to pose_landmarker.task (MediaPipe 0.10+), downloading it on first
+    use. Checked once per process.
+    """
+    global _model_path
+    with _model_lock:
+        if _model_path is not None:
+            return _model_path
 
-    if USE_NEW_API:
-        # MediaPipe 0.10+ API requires explicit model file
-        # Download model if not exists, or use bundled model path
         model_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models")
         os.makedirs(model_dir, exist_ok=True)
         model_path = os.path.join(model_dir, "pose_landmarker.task")
@@ -103,66 +135,344 @@ def process_frame_folder(
         if not os.path.exists(model_path):
             try:
                 import urllib.request
-                model_url = "https://storage.googleapis.com/mediapipe-models/pose_landmarker/pose_landmarker_lite/float16/1/pose_landmarker_lite.task"
                 print(f"Downloading pose model to {model_path}...")
-                urllib.request.urlretrieve(model_url, model_path)
+                # Per-process temp name: several workers may download at once
+                partial_path = f"{model_path}.{os.getpid()}.part"
+                urllib.request.urlretrieve(MODEL_URL, partial_path)
+                os.replace(partial_path, model_path)
                 print("Model downloaded successfully.")
             except Exception as e:
                 raise Exception(f"Failed to download pose model: {str(e)}. Please download manually from: https://developers.google.com/mediapipe/solutions/vision/pose_landmarker")
-        
-        base_options = python.BaseOptions(model_asset_path=model_path)
+
+        _model_path = model_path
+        return _model_path
+
+
+def create_pose_estimator(video_mode: bool = False):
+    """
+    Build the pose model for the installed MediaPipe version.
+    Close it with close_pose_estimator() when done; for request handling
+    prefer the pooled get_pose_estimator().
+    
+    Args:
+        video_mode: Track landmarks from frame to frame (VIDEO running mode /
+            static_image_mode=False) instead of running full detection on
+            every image. Frames must then be fed in time order.
+    """
+    if USE_NEW_API:
+        # MediaPipe 0.10+ API requires explicit model file
+        base_options = python.BaseOptions(model_asset_path=get_pose_model_path())
         options = vision.PoseLandmarkerOptions(
             base_options=base_options,
+            running_mode=vision.RunningMode.VIDEO if video_mode else vision.RunningMode.IMAGE,
             output_segmentation_masks=False,
             min_pose_detection_confidence=0.5,
             min_pose_presence_confidence=0.5,
             min_tracking_confidence=0.5
         )
-        pose = vision.PoseLandmarker.create_from_options(options)
+        return vision.PoseLandmarker.create_from_options(options)
+    
+    # MediaPipe 0.9.x API (old)
+    return mp_pose.Pose(
+        static_image_mode=not video_mode,
+        model_complexity=2,
+        enable_segmentation=False,
+        min_detection_confidence=0.5,
+        min_tracking_confidence=0.5
+    )
+
+
+# Gap left between clips on a reused video-mode estimator
+CLIP_GAP_MS = 1000
+
+
+class VideoPoseEstimator:
+    """
+    Video-mode estimator reusable across clips.
+    
+    MediaPipe requires timestamps to keep increasing for the life of a
+    video-mode landmarker, so each clip is shifted past the end of the
+    previous one; the 0.9.x solution is reset between clips instead.
+    """
+
+    def __init__(self):
+        self.pose = create_pose_estimator(video_mode=True)
+        self.clock_ms = 0
+        self._offset_ms = 0
+
+    def start_clip(self):
+        """Call before the first frame of each new clip."""
+        self._offset_ms = self.clock_ms + CLIP_GAP_MS
+        if hasattr(self.pose, "reset"):
+            self.pose.reset()
+
+    def detect(self, image, timestamp_ms: int) -> dict | None:
+        """Landmarks for a frame at timestamp_ms within the current clip."""
+        timestamp = max(self._offset_ms + int(timestamp_ms), self.clock_ms + 1)
+        self.clock_ms = timestamp
+        return extract_pose_from_image(image, self.pose, timestamp)
+
+    def close(self):
+        close_pose_estimator(self.pose)
+
+
+# One estimator per thread: MediaPipe graphs are not safe to share
+# between threads, but are reusable across requests on the same thread.
+_estimators = threading.local()
+
+
+def get_pose_estimator(video_mode: bool = False):
+    """
+    The calling thread's pose estimator, built on first use and kept for the
+    life of the process. Do not close it.
+    
+    Returns:
+        An image-mode estimator, or a VideoPoseEstimator with video_mode=True
+    """
+    attr = "video_pose" if video_mode else "pose"
+    pose = getattr(_estimators, attr, None)
+    if pose is None:
+        pose = VideoPoseEstimator() if video_mode else create_pose_estimator()
+        setattr(_estimators, attr, pose)
+    return pose
+
+
+def warm_up_pose_estimator(video_mode: bool = False):
+    """
+    Build this thread's estimator and run one inference, so the first
+    request does not pay for model download, graph construction or model load.
+    """
+    pose = get_pose_estimator(video_mode)
+    blank = np.zeros((256, 256, 3), dtype=np.uint8)
+    if video_mode:
+        pose.start_clip()
+        pose.detect(blank, 0)
     else:
-        # MediaPipe 0.9.x API (old)
-        pose = mp_pose.Pose(
-            static_image_mode=True,
-            model_complexity=2,
-            enable_segmentation=False,
-            min_detection_confidence=0.5
-        )
+        extract_pose_from_image(blank, pose)
+    return pose
+
+
+def close_pose_estimator(pose):
+    if hasattr(pose, 'close'):
+        pose.close()
+
+
+def estimate_poses(frames, pose):
+    """
+    Run pose estimation over (frame_name, image) pairs as they arrive.
     
-    try:
+    Yields:
+        (frame_name, landmarks) for frames where a pose was detected
+    """
+    for name, image in frames:
+        landmarks = extract_pose_from_image(image, pose)
+
+        if landmarks is None:
+            print(f" No pose detected in {name}")
+            continue
+
+        yield name, landmarks
+
+
+def estimate_video_poses(frames, tracker: VideoPoseEstimator):
+    """
+    Run tracked pose estimation over (frame_name, image, timestamp_ms)
+    triples from one clip, in time order.
+    
+    Yields:
+        (frame_name, landmarks) for frames where a pose was detected
+    """
+    tracker.start_clip()
+    for name, image, timestamp_ms in frames:
+        if image is None:
+            continue
+        landmarks = tracker.detect(image, timestamp_ms)
+
+        if landmarks is None:
+            print(f" No pose detected in {name}")
+            continue
+
+        yield name, landmarks
 
-        for file in sorted(os.listdir(frame_dir)):
-            if not file.lower().endswith(".jpg"):
-                continue
 
-            frame_path = os.path.join(frame_dir, file)
-            landmarks = extract_pose_from_frame(frame_path, pose)
+# Also write the per-frame pose JSON files next to the pose store
+SAVE_POSE_JSON = os.getenv("CHATBOX_POSE_JSON", "0").lower() in ("1", "true", "yes")
 
-            if landmarks is None:
-                print(f" No pose detected in {file}")
-                continue
+# Worker processes for parallel pose estimation (1 = run in the caller)
+POSE_WORKERS = int(os.getenv("CHATBOX_POSE_WORKERS", "1"))
+# Frames per parallel batch (each batch is tracked as one clip in video mode)
+POSE_BATCH_SIZE = int(os.getenv("CHATBOX_POSE_BATCH_SIZE", "4"))
 
-            output = {
-                "frame": file,
-                "landmarks": landmarks
-            }
+_pool_lock = threading.Lock()
+_pose_pools = {}
 
-            json_path = os.path.join(
-                output_dir,
-                file.replace(".jpg", ".json")
+
+def _init_pose_worker(video_mode: bool):
+    try:
+        warm_up_pose_estimator(video_mode)
+    except Exception as e:
+        # A failing initializer breaks the whole pool; let the first batch
+        # report the error instead
+        print(f"Pose estimator warm-up failed: {e}")
+
+
+def _pose_pool(workers: int, video_mode: bool):
+    """Process pool whose workers each hold one warmed-up estimator."""
+    key = (workers, video_mode)
+    with _pool_lock:
+        if key not in _pose_pools:
+            _pose_pools[key] = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_pose_worker,
+                initargs=(video_mode,)
             )
+        return _pose_pools[key]
+
+
+def _estimate_chunk(chunk, video_mode: bool) -> list:
+    """Pose results for one batch of frames, in a pool worker."""
+    pose = get_pose_estimator(video_mode)
+    if video_mode:
+        return list(estimate_video_poses(chunk, pose))
+    return list(estimate_poses(chunk, pose))
+
 
-            with open(json_path, "w") as f:
-                json.dump(output, f, indent=2)
+def estimate_poses_parallel(frames, workers: int = POSE_WORKERS, video_mode: bool = False,
+                            batch_size: int = POSE_BATCH_SIZE):
+    """
+    Estimate poses over a process pool, one estimator per worker.
+    
+    Frames are read from the iterator as they arrive and sent in contiguous
+    batches of batch_size, with at most two batches per worker in flight, so
+    the clip is never held in memory as a whole. In video mode each batch is
+    tracked as its own clip.
+    
+    Yields:
+        (frame_name, landmarks) for frames where a pose was detected, in
+        frame order
+    """
+    workers = max(1, workers)
+    pool = _pose_pool(workers, video_mode)
+    pending = deque()
 
-            print(f" Pose saved: {json_path}")
+    def batches():
+        batch = []
+        for frame in frames:
+            batch.append(frame)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    try:
+        for batch in batches():
+            pending.append(pool.submit(_estimate_chunk, batch, video_mode))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+    except BrokenProcessPool:
+        # A worker died; build a fresh pool for the next call
+        with _pool_lock:
+            if _pose_pools.get((workers, video_mode)) is pool:
+                del _pose_pools[(workers, video_mode)]
+        raise
     finally:
-        if USE_NEW_API:
-            # New API doesn't need explicit close, but we can clean up
-            pass
+        for future in pending:
+            future.cancel()
+
+
+def shutdown_pose_pools():
+    """Stop the parallel pose estimation workers."""
+    with _pool_lock:
+        for pool in _pose_pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+        _pose_pools.clear()
+
+
+def save_pose(frame_name: str, landmarks: dict, output_dir: str) -> str:
+    output = {
+        "frame": frame_name,
+        "landmarks": landmarks
+    }
+
+    json_path = os.path.join(
+        output_dir,
+        os.path.splitext(frame_name)[0] + ".json"
+    )
+
+    with open(json_path, "w") as f:
+        json.dump(output, f, indent=2)
+
+    print(f" Pose saved: {json_path}")
+    return json_path
+
+
+def process_frames(frames, output_dir: str, pose=None, video_mode: bool = False,
+                   workers: int = POSE_WORKERS, save_json: bool = SAVE_POSE_JSON) -> int:
+    """
+    Estimate poses for (frame_name, image) pairs (e.g. straight from
+    frame_extractor.iter_best_frames) and write them to output_dir as one
+    pose store (see vision.pose_store). Uses the thread's pooled estimator
+    unless one is passed in.
+    
+    With video_mode=True, frames are (frame_name, image, timestamp_ms)
+    triples from a single clip in time order (frame_extractor.iter_timed_frames)
+    and landmarks are tracked between them.
+    
+    With workers > 1 (default CHATBOX_POSE_WORKERS) and no pose passed in,
+    frames are spread over estimate_poses_parallel().
+    
+    With save_json=True (or CHATBOX_POSE_JSON=1), one JSON per detected
+    pose is written as well, for inspection.
+    
+    Returns:
+        Number of poses saved
+    """
+    os.makedirs(output_dir, exist_ok=True)
+
+    if pose is None and workers > 1:
+        poses = estimate_poses_parallel(frames, workers, video_mode)
+    else:
+        if pose is None:
+            pose = get_pose_estimator(video_mode)
+        if video_mode:
+            poses = estimate_video_poses(frames, pose)
         else:
-            # Old API - close if it's a context manager
-            if hasattr(pose, 'close'):
-                pose.close()
+            poses = estimate_poses(frames, pose)
+
+    names = []
+    rows = []
+    for name, landmarks in poses:
+        names.append(name)
+        rows.append(landmarks_to_array(landmarks, LANDMARK_NAMES))
+        if save_json:
+            save_pose(name, landmarks, output_dir)
+
+    array = np.stack(rows) if rows else np.zeros((0, len(LANDMARK_NAMES), 4), dtype=np.float32)
+    write_pose_store(output_dir, names, array, LANDMARK_NAMES)
+    print(f" Pose store saved: {len(names)} frames in {output_dir}")
+
+    return len(names)
+
+
+def iter_frame_folder(frame_dir: str):
+    """Yield (file_name, image) for the JPEGs in a folder, in name order."""
+    for file in sorted(os.listdir(frame_dir)):
+        if not file.lower().endswith(".jpg"):
+            continue
+
+        yield file, cv2.imread(os.path.join(frame_dir, file))
+
+
+def process_frame_folder(
+    frame_dir: str,
+    output_dir: str,
+    save_json: bool = SAVE_POSE_JSON
+):
+    return process_frames(iter_frame_folder(frame_dir), output_dir, save_json=save_json)
 
 
 # ------------------ TEST ------------------
@@ -0,0 +1,72 @@
+"""
+Columnar pose storage for a session.
+
+All detected poses are written once, as a single (frames, 33, 4) float32
+array (x, y, z, visibility per landmark) in poses.npy, plus a small JSON
+index with the frame names and landmark order. The array loads
+memory-mapped, so readers do not copy or parse it.
+"""
+import os
+import json
+import numpy as np
+
+POSE_ARRAY_FILE = "poses.npy"
+POSE_INDEX_FILE = "poses_index.json"
+STORE_VERSION = 1
+
+
+def has_pose_store(pose_dir: str) -> bool:
+    return (os.path.exists(os.path.join(pose_dir, POSE_ARRAY_FILE))
+            and os.path.exists(os.path.join(pose_dir, POSE_INDEX_FILE)))
+
+
+def landmarks_to_array(landmarks: dict, landmark_names: list) -> np.ndarray:
+    """(len(landmark_names), 4) float32 rows for a landmark-name -> [x, y, z, v] dict."""
+    rows = [landmarks.get(name, (0.0, 0.0, 0.0, 0.0)) for name in landmark_names]
+    return np.asarray(rows, dtype=np.float32)
+
+
+def write_pose_store(pose_dir: str, frame_names: list, poses: np.ndarray, landmark_names: list):
+    """
+    Write the pose array and its index (replacing any earlier store).
+
+    Args:
+        pose_dir: Session pose folder
+        frame_names: One name per row of poses
+        poses: (frames, landmarks, 4) array
+        landmark_names: Landmark order of the second axis
+    """
+    poses = np.asarray(poses, dtype=np.float32)
+    if poses.ndim != 3 or poses.shape[0] != len(frame_names) or poses.shape[1] != len(landmark_names):
+        raise ValueError(f"Pose array shape {poses.shape} does not match "
+                         f"{len(frame_names)} frames x {len(landmark_names)} landmarks")
+
+    os.makedirs(pose_dir, exist_ok=True)
+    array_path = os.path.join(pose_dir, POSE_ARRAY_FILE)
+    index_path = os.path.join(pose_dir, POSE_INDEX_FILE)
+
+    # Write to temporary names first so readers never see half a store
+    with open(array_path + ".part", "wb") as f:
+        np.save(f, poses)
+    with open(index_path + ".part", "w") as f:
+        json.dump({
+            "version": STORE_VERSION,
+            "frames": list(frame_names),
+            "landmarks": list(landmark_names)
+        }, f)
+    os.replace(array_path + ".part", array_path)
+    os.replace(index_path + ".part", index_path)
+
+
+def read_pose_store(pose_dir: str, mmap: bool = True):
+    """
+    Load a session's poses.
+
+    Returns:
+        (frame_names, poses, landmark_names); poses is a read-only
+        memory map unless mmap=False
+    """
+    with open(os.path.join(pose_dir, POSE_INDEX_FILE)) as f:
+        index = json.load(f)
+    poses = np.load(os.path.join(pose_dir, POSE_ARRAY_FILE), mmap_mode="r" if mmap else None)
+    return index["frames"], poses, index["landmarks"]
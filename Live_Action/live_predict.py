@@ -6,15 +6,24 @@ Uses trained LSTM model to predict DriveBackhand or DriveForehand in real-time
 import os
 import sys
 import json
+import time
 import base64
 import argparse
+import threading
+from collections import deque
+from contextlib import nullcontext
 import numpy as np
 import cv2
 import torch
 import torch.nn as nn
-from ultralytics import YOLO
 
-# Model architecture (same as predict_action.py)
+# Shared model registry lives next to predict_action.py
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Action_Video_Prediction"))
+import model_registry
+from instrumentation import Instrumentation
+
+
+# Model architecture (same as predict_action.py, plus forward_step for streaming)
 class KeypointLSTMClassifier(nn.Module):
     def __init__(self, feature_dim=51, hidden=128, num_layers=1,
                  num_classes=2, dropout=0.3):
@@ -37,55 +46,348 @@ class KeypointLSTMClassifier(nn.Module):
         h = self.ln(h)
         return self.classifier(h)
 
+    def forward_step(self, x, state=None):
+        """
+        Advance the LSTM by one timestep
+
+        Args:
+            x: (batch, feature_dim) features of one frame
+            state: (h, c) from the previous step, or None for a zero state
+
+        Returns:
+            logits (batch, num_classes), new (h, c)
+        """
+        _, state = self.lstm(x.unsqueeze(1), state)
+        h = self.dropout(state[0][-1])
+        h = self.ln(h)
+        return self.classifier(h), state
+
+
+MODEL_KWARGS = dict(feature_dim=51, hidden=128, num_layers=1, num_classes=2, dropout=0.3)
+
+
+def box_iou(a, b):
+    """IoU of two (x1, y1, x2, y2) boxes"""
+    ix = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
 
 class KeypointExtractor:
-    """Extract human pose keypoints using YOLO11 pose model"""
-    def __init__(self, device='cpu'):
-        self.model = YOLO('yolo11n-pose.pt')
+    """
+    Extract human pose keypoints using YOLO11 pose model
+
+    With track=True, frames after the first detection are pose-estimated on
+    a padded crop around the previous person box (at a smaller input size),
+    keeping the same player locked; full-frame detection is only rerun when
+    the track is lost.
+    """
+    def __init__(self, device='cpu', weights=model_registry.DEFAULT_POSE_WEIGHTS,
+                 track=False, crop_padding=0.25, crop_imgsz=320, min_confidence=0.3,
+                 runtime='eager'):
+        self.model = model_registry.get_pose_model(weights, device=device, runtime=runtime)
         self.device = device
         self.feature_dim = 51
+        self.track = track
+        self.crop_padding = crop_padding  # Box padding on each side, relative to box size
+        self.crop_imgsz = crop_imgsz
+        self.min_confidence = min_confidence  # Below this box score the track is lost
+        self.last_box = None  # Tracked person (x1, y1, x2, y2) in frame pixels
 
     def extract(self, frame):
+        if self.track and self.last_box is not None:
+            features = self._extract_tracked(frame)
+            if features is not None:
+                return features
+        return self.extract_batch([frame])[0]
+
+    def extract_batch(self, frames):
+        """
+        Extract keypoints from several frames in one batched YOLO call
+
+        Returns:
+            np.array of shape (N, 51), zero rows where no person was found
+        """
+        features = np.zeros((len(frames), self.feature_dim), dtype=np.float32)
+        if len(frames) == 0:
+            return features
         try:
-            results = self.model(frame, imgsz=640, device=self.device, verbose=False)
-            if len(results) == 0 or not hasattr(results[0], 'keypoints'):
-                return np.zeros(self.feature_dim, dtype=np.float32)
-            kpts = results[0].keypoints
-            if kpts is None or len(kpts) == 0:
-                return np.zeros(self.feature_dim, dtype=np.float32)
-            kpt_data = kpts.data[0].cpu().numpy()
-            h, w = frame.shape[:2]
-            kpt_data[:, 0] /= w
-            kpt_data[:, 1] /= h
-            features = kpt_data.flatten()
-            return features.astype(np.float32)
+            results = self.model(list(frames), imgsz=640, device=self.device, verbose=False)
+            for i, (frame, result) in enumerate(zip(frames, results)):
+                kpts = getattr(result, 'keypoints', None)
+                if kpts is None or len(kpts) == 0:
+                    if self.track:
+                        self.last_box = None
+                    continue
+                kpt_data = kpts.data[0].cpu().numpy()
+                h, w = frame.shape[:2]
+                kpt_data[:, 0] /= w
+                kpt_data[:, 1] /= h
+                features[i] = kpt_data.flatten()
+                if self.track:
+                    self.last_box = result.boxes.xyxy[0].cpu().numpy().tolist()
         except Exception as e:
             print(f"Keypoint extraction failed: {e}", file=sys.stderr)
-            return np.zeros(self.feature_dim, dtype=np.float32)
+            features[:] = 0
+        return features
+
+    def _extract_tracked(self, frame):
+        """Pose on a crop around the tracked box; None if the track is lost"""
+        h, w = frame.shape[:2]
+        x1, y1, x2, y2 = self.last_box
+        pad_x = (x2 - x1) * self.crop_padding
+        pad_y = (y2 - y1) * self.crop_padding
+        cx1, cy1 = int(max(0, x1 - pad_x)), int(max(0, y1 - pad_y))
+        cx2, cy2 = int(min(w, x2 + pad_x)), int(min(h, y2 + pad_y))
+        if cx2 - cx1 < 2 or cy2 - cy1 < 2:
+            return None
+
+        try:
+            results = self.model(frame[cy1:cy2, cx1:cx2], imgsz=self.crop_imgsz,
+                                 device=self.device, verbose=False)
+        except Exception as e:
+            print(f"Tracked keypoint extraction failed: {e}", file=sys.stderr)
+            return None
+        if len(results) == 0 or results[0].keypoints is None or len(results[0].keypoints) == 0:
+            return None
+
+        # Pick the detection that best overlaps the previous box
+        boxes = results[0].boxes.xyxy.cpu().numpy() + [cx1, cy1, cx1, cy1]
+        scores = results[0].boxes.conf.cpu().numpy()
+        ious = [box_iou(box, self.last_box) for box in boxes]
+        best = int(np.argmax(ious))
+        if scores[best] < self.min_confidence or ious[best] == 0:
+            return None
+
+        kpt_data = results[0].keypoints.data[best].cpu().numpy()
+        kpt_data[:, 0] = (kpt_data[:, 0] + cx1) / w
+        kpt_data[:, 1] = (kpt_data[:, 1] + cy1) / h
+        self.last_box = boxes[best].tolist()
+        return kpt_data.flatten().astype(np.float32)
+
+
+class FrameRingBuffer:
+    """
+    Preallocated buffer of per-frame features with an ordered, zero-copy window
+
+    Storage is a (2 * size, feature_dim) tensor in which every frame is
+    written twice (at slot and slot + size), so the latest `size` frames are
+    always one contiguous slice. While the buffer is filling up, the rest of
+    the window is padded with the newest frame.
+    """
+    def __init__(self, size=16, feature_dim=51, pin_memory=False):
+        self.size = size
+        self.storage = torch.zeros(2 * size, feature_dim, dtype=torch.float32)
+        if pin_memory:
+            # Page-locked memory allows async host-to-GPU copies
+            self.storage = self.storage.pin_memory()
+        self._array = self.storage.numpy()  # Shares memory with storage
+        self.count = 0
+
+    def __len__(self):
+        return min(self.count, self.size)
+
+    def append(self, features):
+        slot = self.count % self.size
+        self._array[slot] = features
+        self._array[slot + self.size] = features
+        if self.count < self.size:
+            self._array[slot + 1:self.size] = features
+        self.count += 1
+
+    def window(self):
+        """Return the latest `size` frames, oldest first, as a tensor view"""
+        start = self.count % self.size if self.count >= self.size else 0
+        return self.storage[start:start + self.size]
+
+    def reset(self):
+        self.count = 0
+
+
+class IncrementalLSTMState:
+    """
+    Streaming LSTM inference, one frame per step
+
+    The model was trained on 16-frame sequences starting from a zero state,
+    so each stream is reset after `window` frames. `streams` staggered
+    streams run side by side in one batched step (stream k starts k *
+    window / streams frames later), and the prediction comes from the
+    stream with the longest history.
+
+    That output equals the full-window forward pass only on frames where the
+    stream has seen exactly `window` frames: every frame with
+    streams=window (still one batched call per frame), every
+    window / streams frames otherwise. In between, the longest stream has
+    seen fewer frames than the window, so its logits are an approximation.
+    Until the first window is filled, the newest frame is fed repeatedly to
+    pad the sequence, as FrameRingBuffer does, so early outputs match too.
+    """
+    def __init__(self, model, window=16, streams=2, device='cpu'):
+        if not 1 <= streams <= window:
+            raise ValueError(f"streams must be between 1 and the window ({window})")
+        self.model = model
+        self.window = window
+        self.streams = streams
+        self.device = device
+        self.reset()
+
+    def reset(self):
+        self.state = None
+        self.seen = 0
+        # Negative step counts delay the start of the staggered streams
+        self.steps = -(np.arange(self.streams) * self.window // self.streams)
+
+    def step(self, features):
+        """Feed one frame of features and return the logits of the longest stream"""
+        x = torch.as_tensor(features, dtype=torch.float32).to(self.device)
+        x = x.unsqueeze(0).repeat(self.streams, 1)
+        with torch.no_grad():
+            logits, (h, c) = self.model.forward_step(x, self.state)
+            waiting = torch.from_numpy(self.steps < 0).to(h.device)
+            h[:, waiting] = 0
+            c[:, waiting] = 0
+            self.steps += 1
+            self.seen += 1
+
+            best = int(self.steps.argmax())
+            output = logits[best].clone()
+            if self.seen < self.window:
+                output = self._padded_output(x[best:best + 1], h[:, best:best + 1],
+                                             c[:, best:best + 1])
+
+            # Streams that completed a window start over from a zero state
+            done = torch.from_numpy(self.steps >= self.window).to(h.device)
+            h[:, done] = 0
+            c[:, done] = 0
+            self.steps[self.steps >= self.window] = 0
+        self.state = (h, c)
+        return output
+
+    def _padded_output(self, x, h, c):
+        # Continue a copy of the first stream with the newest frame until the
+        # sequence reaches the window length
+        state = (h.clone(), c.clone())
+        for _ in range(self.window - self.seen):
+            logits, state = self.model.forward_step(x, state)
+        return logits[0].clone()
+
+
+class AdaptiveFrameScheduler:
+    """
+    Per-session admission control for live frames
+
+    A frame is dropped while the previous one is still being processed, or
+    when frames arrive faster than max_fps allows, so CPU-only hosts answer
+    promptly instead of queueing frames.
+    """
+    def __init__(self, max_fps=None, smoothing=0.2, window_s=2.0):
+        self.max_fps = max_fps
+        self.smoothing = smoothing  # EWMA weight of the newest sample
+        self.window_s = window_s  # Window for the FPS counters
+        self.lock = threading.Lock()
+        self.in_flight = False
+        self.last_start = None
+        self.service_s = None  # Smoothed processing time
+        self.latency_ms = None  # Smoothed end-to-end latency
+        self.received = deque()
+        self.processed = deque()
+        self.dropped = 0
+
+    def admit(self, now):
+        """Return True if the frame received at `now` should be processed"""
+        with self.lock:
+            self._record(self.received, now)
+            min_interval = 1.0 / self.max_fps if self.max_fps else 0.0
+            if self.in_flight or (self.last_start is not None
+                                  and now - self.last_start < min_interval):
+                self.dropped += 1
+                return False
+            self.in_flight = True
+            self.last_start = now
+            return True
+
+    def complete(self, started, now, client_ts=None):
+        """Record a processed frame (started/now from time.monotonic())"""
+        with self.lock:
+            self.in_flight = False
+            self._record(self.processed, now)
+            service_s = now - started
+            if client_ts is not None:
+                latency_ms = time.time() * 1000 - float(client_ts)
+            else:
+                latency_ms = service_s * 1000
+            self.service_s = self._smooth(self.service_s, service_s)
+            self.latency_ms = self._smooth(self.latency_ms, latency_ms)
+
+    def report(self):
+        with self.lock:
+            now = time.monotonic()
+            return {
+                "effective_fps": round(self._rate(self.processed, now), 2),
+                "input_fps": round(self._rate(self.received, now), 2),
+                "latency_ms": round(self.latency_ms or 0.0, 1),
+                "processing_ms": round((self.service_s or 0.0) * 1000, 1),
+                "dropped_frames": self.dropped
+            }
+
+    def _smooth(self, average, sample):
+        if average is None:
+            return sample
+        return (1 - self.smoothing) * average + self.smoothing * sample
+
+    def _record(self, timestamps, now):
+        timestamps.append(now)
+        while timestamps and now - timestamps[0] > self.window_s:
+            timestamps.popleft()
+
+    def _rate(self, timestamps, now):
+        recent = [t for t in timestamps if now - t <= self.window_s]
+        return len(recent) / self.window_s
 
 
 class LiveActionPredictor:
     """Real-time action predictor with frame buffer"""
-    def __init__(self, model_path, device='cpu', buffer_size=16, min_frames=8):
+    def __init__(self, model_path, device='cpu', buffer_size=16, min_frames=8,
+                 incremental=False, streams=2, max_fps=None, track=False, runtime='eager'):
         self.buffer_size = buffer_size
         self.min_frames = min_frames  # Minimum frames needed for prediction
-        self.frame_buffer = []
         self.device = device
+        self.frame_buffer = FrameRingBuffer(
+            buffer_size,
+            feature_dim=51,
+            pin_memory=device == 'cuda' and torch.cuda.is_available()
+        )
         
-        # Initialize keypoint extractor
-        self.keypoint_extractor = KeypointExtractor(device=device)
+        # Initialize keypoint extractor (YOLO weights shared via the registry,
+        # tracking state per predictor)
+        self.keypoint_extractor = KeypointExtractor(device=device, track=track, runtime=runtime)
         
-        # Load model
-        self.model = KeypointLSTMClassifier(
-            feature_dim=51,
-            hidden=128,
-            num_layers=1,
-            num_classes=2,
-            dropout=0.3
+        # Load model (cached per process by the registry)
+        self.model = model_registry.get_classifier(
+            model_path,
+            KeypointLSTMClassifier,
+            device=device,
+            runtime=runtime,
+            **MODEL_KWARGS
         )
-        self.model.load_state_dict(torch.load(model_path, map_location=device))
-        self.model.eval()
-        self.model.to(device)
+        
+        # Optional streaming mode: one LSTM step per frame instead of a
+        # full 16-step pass on every predict()
+        self.incremental_state = None
+        self._step_output = None
+        if incremental:
+            if runtime not in ('eager', 'quantized'):
+                raise ValueError("Incremental mode needs the 'eager' or 'quantized' runtime "
+                                 "(exported models only have the full-window forward)")
+            self.incremental_state = IncrementalLSTMState(
+                self.model, window=buffer_size, streams=streams, device=device
+            )
+        
+        # Frame dropping / latency tracking for this session
+        self.scheduler = AdaptiveFrameScheduler(max_fps=max_fps)
+        self.last_result = None
         
         self.class_names = ['DriveBackhand', 'DriveForehand']
     
@@ -93,10 +395,8 @@ class LiveActionPredictor:
         """Add a frame to the buffer and extract keypoints"""
         kpt_features = self.keypoint_extractor.extract(frame)
         self.frame_buffer.append(kpt_features)
-        
-        # Keep only last buffer_size frames
-        if len(self.frame_buffer) > self.buffer_size:
-            self.frame_buffer.pop(0)
+        if self.incremental_state is not None:
+            self._step_output = self.incremental_state.step(kpt_features)
     
     def predict(self):
         """Predict action from current frame buffer - works with partial data"""
@@ -104,24 +404,18 @@ class LiveActionPredictor:
             # Not enough frames yet, return None
             return None
         
-        # Use available frames (pad if needed)
         available_frames = len(self.frame_buffer)
-        if available_frames < self.buffer_size:
-            # Pad with last frame to reach buffer_size
-            features = list(self.frame_buffer)
-            last_frame = features[-1] if features else np.zeros(51, dtype=np.float32)
-            while len(features) < self.buffer_size:
-                features.append(last_frame.copy())
-        else:
-            # Use last buffer_size frames
-            features = self.frame_buffer[-self.buffer_size:]
-        
-        features_array = np.array(features, dtype=np.float32)
-        features_tensor = torch.tensor(features_array).unsqueeze(0).to(self.device)
         
         # Predict
         with torch.no_grad():
-            output = self.model(features_tensor)
+            if self.incremental_state is not None:
+                output = self._step_output.unsqueeze(0)
+            else:
+                # Last buffer_size frames, padded with the last frame if not yet full
+                features_tensor = self.frame_buffer.window().unsqueeze(0).to(
+                    self.device, non_blocking=True
+                )
+                output = self.model(features_tensor)
             probabilities = torch.softmax(output, dim=1)
             predicted_class = output.argmax(1).item()
             confidence = probabilities[0][predicted_class].item()
@@ -149,85 +443,155 @@ class LiveActionPredictor:
     
     def reset(self):
         """Reset frame buffer"""
-        self.frame_buffer = []
+        self.frame_buffer.reset()
+        self.last_result = None
+        self.keypoint_extractor.last_box = None
+        if self.incremental_state is not None:
+            self.incremental_state.reset()
+            self._step_output = None
 
 
+# Magic bytes of raw JPEG / PNG files
+IMAGE_SIGNATURES = (b'\xff\xd8\xff', b'\x89PNG')
+
 # Global predictor instance (reused across calls)
 _global_predictor = None
 
-def process_frame(frame_data, model_path, device='cpu'):
+
+def decode_frame(frame_data):
+    """
+    Decode a frame given as encoded image bytes (JPEG/PNG), a base64 string
+    (optionally a data URL), an image file path, or an already decoded
+    BGR array. Returns None if decoding fails.
+    """
+    if isinstance(frame_data, (bytes, bytearray, memoryview)):
+        nparr = np.frombuffer(frame_data, np.uint8)
+        return cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    if isinstance(frame_data, str):
+        # Check if it's a file path
+        if os.path.exists(frame_data):
+            return cv2.imread(frame_data)
+        # Remove data URL prefix if present
+        if ',' in frame_data:
+            frame_data = frame_data.split(',')[1]
+        image_data = base64.b64decode(frame_data)
+        nparr = np.frombuffer(image_data, np.uint8)
+        return cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    return frame_data
+
+
+def _waiting_response(predictor):
+    """Default prediction while the buffer has fewer than min_frames"""
+    return {
+        "predicted_class": "Waiting...",
+        "confidence": 0,
+        "probabilities": {
+            "DriveBackhand": 50.0,
+            "DriveForehand": 50.0
+        },
+        "frames_used": len(predictor.frame_buffer)
+    }
+
+
+def process_frame(frame_data, model_path, device='cpu', predictor=None,
+                  inference_lock=None, client_ts=None, runtime='eager',
+                  instrument=False, profile_path=None):
     """
     Process a single frame (base64 encoded image) and return prediction
     
     Args:
-        frame_data: Base64 encoded image string or file path
+        frame_data: Encoded image bytes, base64 string, file path or BGR array
         model_path: Path to model file
         device: 'cpu' or 'cuda'
+        predictor: Optional LiveActionPredictor to use instead of the
+            global one (the live server keeps one per session)
+        inference_lock: Optional lock held around pose + LSTM inference
+            (the live server shares the models between sessions)
+        client_ts: Optional capture time from the browser (ms since epoch),
+            used for end-to-end latency
+        runtime: Model runtime of the global predictor (see model_registry.RUNTIMES)
+        instrument: Attach stage timings and model cache activity under
+            "instrumentation"
+        profile_path: Also write a cProfile trace of this call here
     
     Returns:
         dict with prediction results
     """
+    instrumentation = Instrumentation(enabled=instrument, profile_path=profile_path)
+    try:
+        with instrumentation:
+            result = _process_frame(frame_data, model_path, device, predictor,
+                                    inference_lock, client_ts, runtime, instrumentation)
+    except Exception as e:
+        import traceback
+        result = {
+            "success": False,
+            "error": str(e),
+            "traceback": traceback.format_exc()
+        }
+    return instrumentation.attach(result)
+
+
+def _process_frame(frame_data, model_path, device, predictor, inference_lock, client_ts,
+                   runtime, instrumentation):
     global _global_predictor
     
+    # Initialize predictor (reuse instance if possible)
+    if predictor is None:
+        if _global_predictor is None:
+            with instrumentation.stage("model_load"):
+                _global_predictor = LiveActionPredictor(model_path, device=device,
+                                                        runtime=runtime)
+        predictor = _global_predictor
+    
+    # Drop the frame if this session is still busy or running ahead
+    # of what inference can sustain; answer with the last prediction
+    scheduler = predictor.scheduler
+    received = time.monotonic()
+    if not scheduler.admit(received):
+        instrumentation.count("frames_skipped")
+        return {
+            "success": True,
+            "status": "ready",
+            **(predictor.last_result or _waiting_response(predictor)),
+            "frame_skipped": True,
+            "rate": scheduler.report()
+        }
+    
     try:
-        # Decode base64 image
-        if isinstance(frame_data, str):
-            # Check if it's a file path
-            if os.path.exists(frame_data):
-                frame = cv2.imread(frame_data)
-            else:
-                # Remove data URL prefix if present
-                if ',' in frame_data:
-                    frame_data = frame_data.split(',')[1]
-                image_data = base64.b64decode(frame_data)
-                nparr = np.frombuffer(image_data, np.uint8)
-                frame = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        else:
-            frame = frame_data
-        
+        with instrumentation.stage("decode"):
+            frame = decode_frame(frame_data)
         if frame is None:
             return {
                 "success": False,
                 "error": "Failed to decode image"
             }
         
-        # Initialize predictor (reuse instance if possible)
-        if _global_predictor is None:
-            _global_predictor = LiveActionPredictor(model_path, device=device)
-        
-        # Add frame to buffer
-        _global_predictor.add_frame(frame)
-        
-        # Predict
-        result = _global_predictor.predict()
-        
-        if result is None:
-            # Return a default prediction if not enough frames
-            return {
-                "success": True,
-                "status": "ready",
-                "predicted_class": "Waiting...",
-                "confidence": 0,
-                "probabilities": {
-                    "DriveBackhand": 50.0,
-                    "DriveForehand": 50.0
-                },
-                "frames_used": len(_global_predictor.frame_buffer)
-            }
-        
-        return {
-            "success": True,
-            "status": "ready",
-            **result
-        }
-        
-    except Exception as e:
-        import traceback
-        return {
-            "success": False,
-            "error": str(e),
-            "traceback": traceback.format_exc()
-        }
+        with inference_lock or nullcontext():
+            # Add frame to buffer
+            with instrumentation.stage("pose"):
+                predictor.add_frame(frame)
+            
+            # Predict
+            with instrumentation.stage("lstm"):
+                result = predictor.predict()
+    finally:
+        scheduler.complete(received, time.monotonic(), client_ts=client_ts)
+    instrumentation.count("frames_buffered", len(predictor.frame_buffer))
+    
+    if result is None:
+        # Return a default prediction if not enough frames
+        result = _waiting_response(predictor)
+    else:
+        predictor.last_result = result
+    
+    return {
+        "success": True,
+        "status": "ready",
+        **result,
+        "frame_skipped": False,
+        "rate": scheduler.report()
+    }
 
 
 def main():
@@ -237,6 +601,25 @@ def main():
     parser.add_argument("--model", help="Path to model file")
     parser.add_argument("--device", default="cpu", choices=["cpu", "cuda"], help="Device to use")
     parser.add_argument("--reset", action="store_true", help="Reset frame buffer")
+    parser.add_argument("--serve", action="store_true",
+                        help="Run as a persistent local server (keeps models and buffers warm)")
+    parser.add_argument("--host", default="127.0.0.1", help="Server host (with --serve)")
+    parser.add_argument("--port", type=int, default=8765, help="Server port (with --serve)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Step the LSTM once per frame instead of rerunning 16 steps (with --serve); "
+                             "approximate unless --streams equals the 16-frame window")
+    parser.add_argument("--streams", type=int, default=2,
+                        help="Staggered LSTM streams with --incremental: 2 = ~8x less LSTM work, "
+                             "outputs exact every 8th frame; 16 = exact on every frame (default: 2)")
+    parser.add_argument("--max_fps", type=float,
+                        help="Cap on processed frames per second per session (with --serve)")
+    parser.add_argument("--track", action="store_true",
+                        help="Pose-estimate a crop around the tracked player instead of the full frame (with --serve)")
+    parser.add_argument("--runtime", default="eager", choices=model_registry.RUNTIMES,
+                        help="Model runtime; torchscript/onnx need Action_Video_Prediction/export_models.py first")
+    parser.add_argument("--instrument", action="store_true",
+                        help="Add stage timings and model cache hits to the result")
+    parser.add_argument("--profile", help="Write a cProfile trace of this frame to this file")
     
     args = parser.parse_args()
     
@@ -257,6 +640,14 @@ def main():
         print(json.dumps(result, indent=2))
         sys.exit(1)
     
+    # Long-running server mode
+    if args.serve:
+        from live_server import serve
+        serve(model_path, device=args.device, host=args.host, port=args.port,
+              incremental=args.incremental, streams=args.streams, max_fps=args.max_fps,
+              track=args.track, runtime=args.runtime)
+        return
+    
     # Reset buffer if requested
     if args.reset:
         global _global_predictor
@@ -275,9 +666,11 @@ def main():
         frame_data = args.frame
     elif args.frame_file:
         if os.path.exists(args.frame_file):
-            # Read the file - it contains base64 encoded data
-            with open(args.frame_file, 'r', encoding='utf-8') as f:
-                frame_data = f.read().strip()
+            # The file holds either the raw image (JPEG/PNG) or base64 text
+            with open(args.frame_file, 'rb') as f:
+                frame_data = f.read()
+            if not frame_data.startswith(IMAGE_SIGNATURES):
+                frame_data = frame_data.decode('utf-8').strip()
         else:
             result = {
                 "success": False,
@@ -294,7 +687,8 @@ def main():
         sys.exit(1)
     
     # Process frame
-    result = process_frame(frame_data, model_path, device=args.device)
+    result = process_frame(frame_data, model_path, device=args.device, runtime=args.runtime,
+                           instrument=args.instrument, profile_path=args.profile)
     print(json.dumps(result, indent=2))
     
     if not result.get("success"):
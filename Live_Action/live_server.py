@@ -0,0 +1,211 @@
+"""
+Persistent Live Action Prediction Server
+Keeps the pose model and LSTM classifier loaded between webcam frames and
+holds one frame buffer per user session, so live_action.php only pays for
+inference instead of a Python start-up per frame.
+"""
+
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import cv2
+import numpy as np
+
+from live_predict import MODEL_KWARGS, KeypointLSTMClassifier, LiveActionPredictor, process_frame
+import model_registry  # importable once live_predict has set up sys.path
+
+
+class SessionStore:
+    """Per-session predictors sharing one set of loaded models"""
+    def __init__(self, model_path, device='cpu', session_ttl=300, **predictor_kwargs):
+        self.model_path = model_path
+        self.device = device
+        self.session_ttl = session_ttl
+        # Options for each session's LiveActionPredictor (incremental, streams,
+        # max_fps, track, runtime)
+        self.predictor_kwargs = predictor_kwargs
+        self.sessions = {}
+        self.lock = threading.Lock()
+        # YOLO and the LSTM are shared, so inference is serialized
+        self.inference_lock = threading.Lock()
+
+        # Load models once; every session gets them from the registry
+        model_registry.warm_up(
+            model_path=model_path,
+            model_cls=KeypointLSTMClassifier,
+            device=device,
+            runtime=predictor_kwargs.get('runtime', 'eager'),
+            **MODEL_KWARGS
+        )
+
+    def get(self, session_id):
+        """Return the predictor for a session, creating it on first use"""
+        now = time.monotonic()
+        with self.lock:
+            self._evict_idle(now)
+            entry = self.sessions.get(session_id)
+            if entry is None:
+                predictor = LiveActionPredictor(
+                    self.model_path,
+                    device=self.device,
+                    **self.predictor_kwargs
+                )
+                entry = {"predictor": predictor, "last_seen": now}
+                self.sessions[session_id] = entry
+            entry["last_seen"] = now
+            return entry["predictor"]
+
+    def reset(self, session_id):
+        with self.lock:
+            entry = self.sessions.get(session_id)
+        if entry is not None:
+            with self.inference_lock:
+                entry["predictor"].reset()
+
+    def _evict_idle(self, now):
+        expired = [sid for sid, entry in self.sessions.items()
+                   if now - entry["last_seen"] > self.session_ttl]
+        for sid in expired:
+            del self.sessions[sid]
+
+
+class LivePredictionHandler(BaseHTTPRequestHandler):
+    """
+    Endpoints:
+    - GET /health
+    - POST /predict, /reset: JSON body with session_id (and base64 frame,
+      optional "instrument": true for stage timings)
+    - POST /predict_binary?session_id=...&client_ts=...&instrument=1: the body is the
+      frame itself, either an encoded image (image/jpeg, image/png) or raw
+      RGB pixels (application/octet-stream with X-Frame-Width/Height)
+    """
+    store = None
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {
+                "success": True,
+                "status": "healthy",
+                "sessions": len(self.store.sessions),
+                "models": model_registry.stats()
+            })
+        else:
+            self._send_json(404, {"success": False, "error": "Not found"})
+
+    def do_POST(self):
+        if urlparse(self.path).path == "/predict_binary":
+            self._predict_binary()
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except (ValueError, json.JSONDecodeError):
+            self._send_json(400, {"success": False, "error": "Invalid JSON body"})
+            return
+
+        session_id = str(payload.get("session_id") or "default")
+
+        if self.path == "/reset":
+            self.store.reset(session_id)
+            self._send_json(200, {"success": True, "message": "Buffer reset"})
+            return
+
+        if self.path == "/predict":
+            frame_data = payload.get("frame")
+            if not frame_data:
+                self._send_json(400, {
+                    "success": False,
+                    "error": "No frame data provided"
+                })
+                return
+            predictor = self.store.get(session_id)
+            # Frame decoding and dropping happen outside the shared lock
+            result = process_frame(
+                frame_data,
+                self.store.model_path,
+                device=self.store.device,
+                predictor=predictor,
+                inference_lock=self.store.inference_lock,
+                client_ts=payload.get("client_ts"),
+                instrument=bool(payload.get("instrument"))
+            )
+            self._send_json(200, result)
+            return
+
+        self._send_json(404, {"success": False, "error": "Not found"})
+
+    def _predict_binary(self):
+        query = parse_qs(urlparse(self.path).query)
+        session_id = query.get("session_id", ["default"])[0]
+        client_ts = query.get("client_ts", [None])[0]
+        instrument = query.get("instrument", ["0"])[0] in ("1", "true")
+
+        length = int(self.headers.get("Content-Length", 0))
+        if length <= 0:
+            self._send_json(400, {"success": False, "error": "No frame data provided"})
+            return
+        body = self.rfile.read(length)
+
+        frame_data = body
+        if self.headers.get("Content-Type", "").startswith("application/octet-stream"):
+            try:
+                width = int(self.headers["X-Frame-Width"])
+                height = int(self.headers["X-Frame-Height"])
+                rgb = np.frombuffer(body, np.uint8).reshape(height, width, 3)
+            except (KeyError, TypeError, ValueError):
+                self._send_json(400, {
+                    "success": False,
+                    "error": "Raw frames need X-Frame-Width/X-Frame-Height matching the body"
+                })
+                return
+            frame_data = cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
+
+        predictor = self.store.get(session_id)
+        result = process_frame(
+            frame_data,
+            self.store.model_path,
+            device=self.store.device,
+            predictor=predictor,
+            inference_lock=self.store.inference_lock,
+            client_ts=client_ts,
+            instrument=instrument
+        )
+        self._send_json(200, result)
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        # Keep per-frame request logs out of the console
+        pass
+
+
+def serve(model_path, device='cpu', host='127.0.0.1', port=8765, session_ttl=300,
+          **predictor_kwargs):
+    """
+    Run the live prediction server until interrupted
+
+    predictor_kwargs are passed to each session's LiveActionPredictor
+    (incremental, streams, max_fps, track, runtime)
+    """
+    LivePredictionHandler.store = SessionStore(
+        model_path, device=device, session_ttl=session_ttl, **predictor_kwargs
+    )
+    server = ThreadingHTTPServer((host, port), LivePredictionHandler)
+    print(f"Live action server listening on http://{host}:{port}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -89,6 +89,8 @@ class ChatBoxAPI {
     
     /**
      * Analyze uploaded video
+     * Queues the analysis job, then polls its result until it finishes
+     * or the client timeout runs out.
      * @param string $sessionId Session ID from upload
      * @param string $skill Skill name
      * @return array|null Analysis result or null on error
@@ -109,7 +111,7 @@ class ChatBoxAPI {
             'Content-Length: ' . strlen($postData)
         ]);
         curl_setopt($ch, CURLOPT_RETURNTRANSFER, true);
-        curl_setopt($ch, CURLOPT_TIMEOUT, $this->timeout);
+        curl_setopt($ch, CURLOPT_TIMEOUT, 30);
         curl_setopt($ch, CURLOPT_CONNECTTIMEOUT, 10);
         
         $response = curl_exec($ch);
@@ -122,6 +124,56 @@ class ChatBoxAPI {
             return null;
         }
         
+        if ($httpCode !== 202 && $httpCode !== 200) {
+            error_log("ChatBoxAPI analyze failed with HTTP $httpCode: $response");
+            return null;
+        }
+        
+        $job = json_decode($response, true);
+        if (json_last_error() !== JSON_ERROR_NONE || !isset($job['job_id'])) {
+            error_log("ChatBoxAPI: Invalid JSON response: $response");
+            return null;
+        }
+        
+        return $this->waitForAnalysis($job['job_id']);
+    }
+    
+    /**
+     * Poll an analysis job until it completes
+     * @param string $jobId Job ID from analyzeVideo
+     * @return array|null Analysis result or null on error/timeout
+     */
+    public function waitForAnalysis(string $jobId): ?array {
+        $url = $this->baseUrl . '/api/analyze-video/' . rawurlencode($jobId) . '/result';
+        $deadline = time() + $this->timeout;
+        
+        while (true) {
+            $ch = curl_init($url);
+            curl_setopt($ch, CURLOPT_RETURNTRANSFER, true);
+            curl_setopt($ch, CURLOPT_TIMEOUT, 30);
+            curl_setopt($ch, CURLOPT_CONNECTTIMEOUT, 10);
+            
+            $response = curl_exec($ch);
+            $httpCode = curl_getinfo($ch, CURLINFO_HTTP_CODE);
+            $error = curl_error($ch);
+            curl_close($ch);
+            
+            if ($error) {
+                error_log("ChatBoxAPI analyze status error: $error");
+                return null;
+            }
+            
+            // 202: still queued or running
+            if ($httpCode !== 202) {
+                break;
+            }
+            if (time() >= $deadline) {
+                error_log("ChatBoxAPI analyze job $jobId timed out");
+                return null;
+            }
+            usleep(500000);
+        }
+        
         if ($httpCode !== 200) {
             error_log("ChatBoxAPI analyze failed with HTTP $httpCode: $response");
             return null;
@@ -53,6 +53,74 @@ if ($_SERVER['REQUEST_METHOD'] !== 'POST') {
 // Get action from request
 $action = $_POST['action'] ?? 'predict';
 
+/**
+ * Forward a request to the persistent live prediction server
+ * (started with: python Live_Action/live_predict.py --serve)
+ * @return array|null Decoded response, or null if the server is not reachable
+ */
+function liveServerRequest(string $endpoint, array $payload): ?array {
+    $baseUrl = getenv('LIVE_ACTION_SERVER') ?: 'http://127.0.0.1:8765';
+    $postData = json_encode($payload);
+    
+    $ch = curl_init(rtrim($baseUrl, '/') . $endpoint);
+    curl_setopt($ch, CURLOPT_POST, true);
+    curl_setopt($ch, CURLOPT_POSTFIELDS, $postData);
+    curl_setopt($ch, CURLOPT_HTTPHEADER, [
+        'Content-Type: application/json',
+        'Content-Length: ' . strlen($postData)
+    ]);
+    curl_setopt($ch, CURLOPT_RETURNTRANSFER, true);
+    curl_setopt($ch, CURLOPT_TIMEOUT, 30);
+    curl_setopt($ch, CURLOPT_CONNECTTIMEOUT_MS, 200);
+    
+    $response = curl_exec($ch);
+    $httpCode = curl_getinfo($ch, CURLINFO_HTTP_CODE);
+    $error = curl_error($ch);
+    curl_close($ch);
+    
+    if ($error || $httpCode !== 200) {
+        return null;
+    }
+    
+    $result = json_decode($response, true);
+    return is_array($result) ? $result : null;
+}
+
+/**
+ * Send a raw encoded frame (JPEG/PNG bytes) to the persistent live server
+ * @return array|null Decoded response, or null if the server is not reachable
+ */
+function liveServerBinaryRequest(string $frameBytes, string $mimeType, ?float $clientTs): ?array {
+    $baseUrl = getenv('LIVE_ACTION_SERVER') ?: 'http://127.0.0.1:8765';
+    $query = ['session_id' => session_id()];
+    if ($clientTs !== null) {
+        $query['client_ts'] = $clientTs;
+    }
+    
+    $ch = curl_init(rtrim($baseUrl, '/') . '/predict_binary?' . http_build_query($query));
+    curl_setopt($ch, CURLOPT_POST, true);
+    curl_setopt($ch, CURLOPT_POSTFIELDS, $frameBytes);
+    curl_setopt($ch, CURLOPT_HTTPHEADER, [
+        'Content-Type: ' . $mimeType,
+        'Content-Length: ' . strlen($frameBytes)
+    ]);
+    curl_setopt($ch, CURLOPT_RETURNTRANSFER, true);
+    curl_setopt($ch, CURLOPT_TIMEOUT, 30);
+    curl_setopt($ch, CURLOPT_CONNECTTIMEOUT_MS, 200);
+    
+    $response = curl_exec($ch);
+    $httpCode = curl_getinfo($ch, CURLINFO_HTTP_CODE);
+    $error = curl_error($ch);
+    curl_close($ch);
+    
+    if ($error || $httpCode !== 200) {
+        return null;
+    }
+    
+    $result = json_decode($response, true);
+    return is_array($result) ? $result : null;
+}
+
 try {
     ob_end_clean();
     
@@ -71,6 +139,13 @@ try {
     
     // Handle reset action
     if ($action === 'reset') {
+        // Prefer the persistent server, which holds this session's buffer
+        $serverResult = liveServerRequest('/reset', ['session_id' => session_id()]);
+        if ($serverResult !== null) {
+            echo json_encode($serverResult, JSON_UNESCAPED_UNICODE | JSON_UNESCAPED_SLASHES);
+            exit;
+        }
+        
         // Get Python executable
         $pythonCmd = null;
         if (strtoupper(substr(PHP_OS, 0, 3)) === 'WIN') {
@@ -140,18 +215,53 @@ try {
     
     // Handle predict action
     if ($action === 'predict') {
-        // Get frame data
-        $frameData = $_POST['frame'] ?? '';
+        $clientTs = isset($_POST['client_ts']) ? (float)$_POST['client_ts'] : null;
         
-        if (empty($frameData)) {
-            throw new Exception('No frame data provided');
+        // Get frame data: binary JPEG upload (preferred) or base64 string
+        $frameUpload = null;
+        $frameData = '';
+        if (isset($_FILES['frame']) && $_FILES['frame']['error'] === UPLOAD_ERR_OK) {
+            $frameUpload = $_FILES['frame']['tmp_name'];
+        } else {
+            $frameData = $_POST['frame'] ?? '';
+            
+            if (empty($frameData)) {
+                throw new Exception('No frame data provided');
+            }
+            
+            // Remove data URL prefix if present
+            if (strpos($frameData, ',') !== false) {
+                $frameData = explode(',', $frameData)[1];
+            }
         }
         
-        // Remove data URL prefix if present
-        if (strpos($frameData, ',') !== false) {
-            $frameData = explode(',', $frameData)[1];
+        // Prefer the persistent server: models stay loaded and the
+        // frame buffer accumulates across requests of this session
+        if ($frameUpload !== null) {
+            $frameBytes = file_get_contents($frameUpload);
+            $mimeType = $_FILES['frame']['type'] ?: 'image/jpeg';
+            $serverResult = $frameBytes === false
+                ? null
+                : liveServerBinaryRequest($frameBytes, $mimeType, $clientTs);
+        } else {
+            $serverResult = liveServerRequest('/predict', [
+                'session_id' => session_id(),
+                'frame' => $frameData,
+                'client_ts' => $clientTs
+            ]);
+        }
+        if ($serverResult !== null) {
+            if (!($serverResult['success'] ?? false)) {
+                if (isset($serverResult['traceback'])) {
+                    error_log("Live server traceback: " . $serverResult['traceback']);
+                }
+                throw new Exception($serverResult['error'] ?? 'Prediction failed');
+            }
+            echo json_encode($serverResult, JSON_UNESCAPED_UNICODE | JSON_UNESCAPED_SLASHES);
+            exit;
         }
         
+        // Fallback: one-shot Python process per frame
         // Get Python executable
         $pythonCmd = null;
         if (strtoupper(substr(PHP_OS, 0, 3)) === 'WIN') {
@@ -179,21 +289,26 @@ try {
             throw new Exception('Python not found. Please install Python.');
         }
         
-        // Create temp file for frame data (to avoid command line length issues)
-        // Use .txt extension and write as text (base64 string)
-        $tempDir = sys_get_temp_dir();
-        if (!is_writable($tempDir)) {
-            // Fallback to Live_Action directory
-            $tempDir = $liveActionDir;
-        }
-        
-        $tempFile = tempnam($tempDir, 'live_frame_') . '.txt';
-        
-        // Write frame data to temp file
-        $writeResult = @file_put_contents($tempFile, $frameData);
-        if ($writeResult === false) {
-            error_log("Failed to write temp file: " . $tempFile);
-            throw new Exception('Failed to create temporary file for frame data');
+        if ($frameUpload !== null) {
+            // Binary uploads are already on disk: pass PHP's upload file as is
+            $tempFile = $frameUpload;
+        } else {
+            // Create temp file for frame data (to avoid command line length issues)
+            // Use .txt extension and write as text (base64 string)
+            $tempDir = sys_get_temp_dir();
+            if (!is_writable($tempDir)) {
+                // Fallback to Live_Action directory
+                $tempDir = $liveActionDir;
+            }
+            
+            $tempFile = tempnam($tempDir, 'live_frame_') . '.txt';
+            
+            // Write frame data to temp file
+            $writeResult = @file_put_contents($tempFile, $frameData);
+            if ($writeResult === false) {
+                error_log("Failed to write temp file: " . $tempFile);
+                throw new Exception('Failed to create temporary file for frame data');
+            }
         }
         
         $command = escapeshellarg($pythonCmd) . ' ' . 
@@ -207,8 +322,10 @@ try {
         $output = shell_exec($command);
         chdir($originalDir);
         
-        // Clean up temp file
-        @unlink($tempFile);
+        // Clean up temp file (PHP removes upload files itself)
+        if ($frameUpload === null) {
+            @unlink($tempFile);
+        }
         
         if (!$output) {
             error_log("Python script returned no output. Command: " . $command);
@@ -449,22 +449,24 @@ function captureAndPredict() {
         const ctx = canvas.getContext('2d');
         ctx.drawImage(videoElement, 0, 0);
         
-        // Convert to base64
-        const frameData = canvas.toDataURL('image/jpeg', 0.8);
-        
-        // Send to backend
-        sendFrameForPrediction(frameData);
+        // Encode as binary JPEG (no base64 inflation) and send to backend
+        canvas.toBlob((frameBlob) => {
+            if (frameBlob) {
+                sendFrameForPrediction(frameBlob);
+            }
+        }, 'image/jpeg', 0.8);
         
     } catch (error) {
         console.error('Error capturing frame:', error);
     }
 }
 
-async function sendFrameForPrediction(frameData) {
+async function sendFrameForPrediction(frameBlob) {
     try {
         const formData = new FormData();
         formData.append('action', 'predict');
-        formData.append('frame', frameData);
+        formData.append('frame', frameBlob, 'frame.jpg');
+        formData.append('client_ts', Date.now());
         
         const response = await fetch('/pickelball/main/backend/live_action.php', {
             method: 'POST',